@@ -1,40 +1,331 @@
 #!/usr/bin/env python3
 import os
 import sys
+import re
 import glob
+import json
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+import matplotlib
+# Plots are only ever written to files, so skip interactive backend selection
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import defaultdict
 
-def parse_log_file(log_file):
-    """Parse a log file into a pandas DataFrame"""
-    data = []
+# Every event type a machine can log, in a fixed order so they can be counted by code
+EVENT_TYPES = ['START', 'SEND', 'RECEIVE', 'INTERNAL']
+
+# Fields of each log line. Only the START line's trailing field (the machine
+# parameters) is ever used, so it is kept in df.attrs rather than as a column.
+LOG_FIELDS = ['event_type', 'timestamp', 'queue_size', 'logical_clock', 'additional_info']
+LOG_COLUMNS = LOG_FIELDS[:4]
+LOG_DTYPES = {
+    'event_type': pd.CategoricalDtype(EVENT_TYPES),
+    'timestamp': 'float64',
+    'queue_size': 'int32',
+    'logical_clock': 'int64',
+}
+START_PARAMS_ATTR = 'start_params'
+
+# Resolution of saved plots
+PLOT_DPI = 90
+
+# Parsed CSV logs are cached next to the log as <log>.feather (requires pyarrow)
+CACHE_SUFFIX = '.feather'
+CACHE_KEY_FIELD = b'log_cache_key'
+
+# Schema metadata key under which sidecars and Parquet logs carry the START
+# parameters as JSON, so they do not depend on pandas storing df.attrs
+START_PARAMS_FIELD = b'start_params'
+
+# Per-machine log file names: machine_<id>.log and its Parquet conversion
+LOG_FILE_RE = re.compile(r'machine_(\d+)\.(log|parquet)$')
+
+# key=value pairs in a START line's parameters, separated by ';' (or ',' in older logs)
+START_PARAM_RE = re.compile(r'([^;,=\s]+)\s*=\s*([^;,]*)')
+
+# Read buffer for the line-by-line fallback parser
+LOG_READ_BUFFER_SIZE = 1 << 20
+
+# Rows per Parquet row group when converting logs
+PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+# Logs are parsed in worker processes only when there is enough data to
+# pay for starting the pool and pickling the results back
+PARALLEL_PARSE_MIN_BYTES = 8 * 1024 * 1024
+
+def parse_log_file(log_file, columns=None):
+    """
+    Parse a log file into a pandas DataFrame.
+    
+    The parameters from the START line (clock_rate, internal_prob) are
+    returned in df.attrs['start_params'] as a dict of strings.
+    
+    Args:
+        log_file (str): Path to a CSV (.log) or Parquet (.parquet) log
+        columns (list, optional): Only load these columns (Parquet logs only)
+    """
+    if log_file.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return _log_from_table(pq.read_table(log_file, columns=columns))
+    
+    df = _read_cached_log(log_file)
+    if df is None:
+        df = _read_log_csv(log_file)
+        _write_cached_log(log_file, df)
+    return df
+
+def _parse_start_params(info):
+    """Split a START line's "key=value;key=value" field into a dict"""
+    return {key: value.strip() for key, value in START_PARAM_RE.findall(info)}
+
+def _read_start_params(log_file):
+    """Read the machine parameters from the START line of a CSV log"""
     with open(log_file, 'r') as f:
         for line in f:
-            parts = line.strip().split(',', 4)  # Split only on the first 4 commas
-            if len(parts) >= 4:
-                event_type = parts[0]
-                timestamp = float(parts[1])
-                queue_size = int(parts[2])
-                logical_clock = int(parts[3])
-                
-                # Extract additional info if available
-                additional_info = parts[4] if len(parts) > 4 else ""
-                
-                data.append({
-                    'event_type': event_type,
-                    'timestamp': timestamp,
-                    'queue_size': queue_size,
-                    'logical_clock': logical_clock,
-                    'additional_info': additional_info
-                })
-    
-    return pd.DataFrame(data)
+            if line.startswith('START,'):
+                parts = line.rstrip('\n').split(',', 4)
+                return _parse_start_params(parts[4]) if len(parts) > 4 else {}
+    return {}
+
+def _cache_key(log_file):
+    """Identify the current contents of a log file by its size and modification time"""
+    stat = os.stat(log_file)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+def _log_to_table(df, metadata=None):
+    """
+    Convert a parsed log to an Arrow table with its START parameters in the schema metadata.
+    
+    Args:
+        df (DataFrame): Parsed log, with the parameters in df.attrs
+        metadata (dict, optional): Extra schema metadata entries
+    """
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[START_PARAMS_FIELD] = json.dumps(df.attrs.get(START_PARAMS_ATTR, {})).encode()
+    schema_metadata.update(metadata or {})
+    return table.replace_schema_metadata(schema_metadata)
+
+def _log_from_table(table):
+    """Convert an Arrow table written by _log_to_table back to a parsed log"""
+    df = table.to_pandas()
+    params = (table.schema.metadata or {}).get(START_PARAMS_FIELD)
+    if params is not None:
+        df.attrs[START_PARAMS_ATTR] = json.loads(params)
+    else:
+        # Files written before the parameters were stored explicitly
+        df.attrs.setdefault(START_PARAMS_ATTR, {})
+    return df
+
+def _read_cached_log(log_file):
+    """Load a previously parsed log from its Feather sidecar, or None if missing, stale or unreadable"""
+    cache_file = log_file + CACHE_SUFFIX
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    try:
+        table = feather.read_table(cache_file)
+    except (OSError, ValueError, pa.ArrowException):
+        # A corrupt or truncated sidecar is just a cache miss; it is
+        # overwritten once the log has been parsed again
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(CACHE_KEY_FIELD) != _cache_key(log_file):
+        return None
+    # Sidecars written before a column layout change, or before the START
+    # parameters were stored, are stale too
+    if table.column_names != LOG_COLUMNS or START_PARAMS_FIELD not in metadata:
+        return None
+    return _log_from_table(table)
+
+def _write_cached_log(log_file, df):
+    """Save a parsed log to a Feather sidecar, tagged with the log's size and mtime"""
+    cache_file = log_file + CACHE_SUFFIX
+    # Write next to the sidecar and move it into place, so an interrupted
+    # write never leaves a half-written sidecar behind
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        table = _log_to_table(df, {CACHE_KEY_FIELD: _cache_key(log_file)})
+        feather.write_feather(table, tmp_file)
+        os.replace(tmp_file, cache_file)
+    except ImportError:
+        # Caching is only an optimization; pyarrow is optional
+        pass
+    except (OSError, ValueError, pa.ArrowException):
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+def _read_log_csv(log_file):
+    """Parse a CSV log file"""
+    try:
+        # Let the C parser tokenize the whole file in one pass. An overlong
+        # first row only triggers a warning, so escalate it to an error.
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', pd.errors.ParserWarning)
+            df = pd.read_csv(
+                log_file,
+                sep=',',
+                header=None,
+                names=LOG_FIELDS,
+                usecols=LOG_COLUMNS,
+                index_col=False,
+                dtype=LOG_DTYPES,
+                engine='c',
+                na_filter=False,
+            )
+    except (pd.errors.ParserError, pd.errors.ParserWarning, ValueError):
+        # Some rows carry commas inside the additional info field
+        # (e.g. "peer(s) [0, 1]"), which the C parser rejects, and a machine
+        # killed mid-write leaves a short last line that it cannot convert;
+        # the line-by-line parser copes with both
+        return _parse_log_file_python(log_file)
+    
+    # The START line comes first, so this only reads the head of the file
+    df.attrs[START_PARAMS_ATTR] = _read_start_params(log_file)
+    return df
+
+def _parse_log_file_python(log_file):
+    """Parse a log file line by line, treating everything past the fourth comma as additional info"""
+    # Read the whole file as bytes in one go; int() and float() accept
+    # bytes directly, so only the event type needs decoding
+    with open(log_file, 'rb', buffering=LOG_READ_BUFFER_SIZE) as f:
+        lines = f.read().splitlines()
+    n = len(lines)
+    
+    # One preallocated buffer per column instead of a dict per row
+    event_types = [''] * n
+    timestamps = np.empty(n, dtype=np.float64)
+    queue_sizes = np.empty(n, dtype=np.int32)
+    logical_clocks = np.empty(n, dtype=np.int64)
+    start_params = None
+    
+    count = 0
+    for line in lines:
+        parts = line.strip().split(b',', 4)  # Split only on the first 4 commas
+        if len(parts) >= 4:
+            try:
+                timestamps[count] = float(parts[1])
+                queue_sizes[count] = int(parts[2])
+                logical_clocks[count] = int(parts[3])
+            except ValueError:
+                # A line cut off mid-field by a killed machine; skip it
+                # like a line that is missing fields altogether
+                continue
+            event_types[count] = parts[0].decode()
+            
+            # Only the first START line's additional info is needed
+            if start_params is None and parts[0] == b'START':
+                start_params = _parse_start_params(parts[4].decode()) if len(parts) > 4 else {}
+            count += 1
+    
+    df = pd.DataFrame({
+        'event_type': pd.Categorical(event_types[:count], categories=EVENT_TYPES),
+        'timestamp': timestamps[:count],
+        'queue_size': queue_sizes[:count],
+        'logical_clock': logical_clocks[:count],
+    })
+    df.attrs[START_PARAMS_ATTR] = start_params or {}
+    return df
+
+def convert_log_file(log_file):
+    """Write a CSV log to a Parquet file next to it and return the new path"""
+    parquet_file = os.path.splitext(log_file)[0] + '.parquet'
+    import pyarrow.parquet as pq
+    df = parse_log_file(log_file)
+    pq.write_table(_log_to_table(df), parquet_file, compression='zstd', row_group_size=PARQUET_ROW_GROUP_SIZE)
+    return parquet_file
+
+def find_log_files(experiment_dir):
+    """
+    Find the log file for each machine in an experiment directory.
+    
+    A Parquet log is preferred over the CSV log it was converted from,
+    unless the CSV log has been written since.
+    
+    Returns:
+        dict: machine ID -> log file path
+    """
+    # One directory scan both filters the names and extracts the machine IDs
+    csv_entries = {}
+    parquet_entries = {}
+    with os.scandir(experiment_dir) as entries:
+        for entry in entries:
+            match = LOG_FILE_RE.match(entry.name)
+            if match:
+                found = csv_entries if match.group(2) == 'log' else parquet_entries
+                found[int(match.group(1))] = entry
+    
+    log_files = {}
+    for machine_id in sorted(csv_entries.keys() | parquet_entries.keys()):
+        entry = csv_entries.get(machine_id)
+        parquet_entry = parquet_entries.get(machine_id)
+        if parquet_entry is not None and (
+                entry is None or parquet_entry.stat().st_mtime >= entry.stat().st_mtime):
+            entry = parquet_entry
+        log_files[machine_id] = entry.path
+    return log_files
+
+def convert_experiment(experiment_dir):
+    """Convert all CSV logs in an experiment directory to Parquet"""
+    log_files = glob.glob(f"{experiment_dir}/machine_*.log")
+    if not log_files:
+        print(f"No log files found in {experiment_dir}")
+        return
+    for log_file in log_files:
+        print(f"Wrote {convert_log_file(log_file)}")
+
+def nearest_indices(timestamps, points):
+    """Return the index of the closest timestamp for each point (timestamps must be sorted)"""
+    right = np.clip(np.searchsorted(timestamps, points), 0, len(timestamps) - 1)
+    left = np.clip(right - 1, 0, len(timestamps) - 1)
+    # Prefer the earlier timestamp on ties, like idxmin would
+    use_left = np.abs(points - timestamps[left]) <= np.abs(timestamps[right] - points)
+    return np.where(use_left, left, right)
+
+def parse_log_files(log_files):
+    """
+    Parse several log files, fanning out to one process per file when worthwhile.
+    
+    Args:
+        log_files: Mapping of machine ID to log file path
+    
+    Returns:
+        Mapping of machine ID to parsed DataFrame, in the same order
+    """
+    machine_ids = list(log_files)
+    paths = [log_files[machine_id] for machine_id in machine_ids]
+    total_size = sum(os.path.getsize(path) for path in paths)
+    
+    if len(paths) < 2 or total_size < PARALLEL_PARSE_MIN_BYTES:
+        return {machine_id: parse_log_file(path) for machine_id, path in zip(machine_ids, paths)}
+    
+    with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+        results = executor.map(_parse_log_file_with_params, paths)
+        machine_data = {}
+        for machine_id, (df, params) in zip(machine_ids, results):
+            df.attrs[START_PARAMS_ATTR] = params
+            machine_data[machine_id] = df
+        return machine_data
+
+def _parse_log_file_with_params(log_file):
+    """Parse a log in a worker process, returning the START parameters alongside rather than in df.attrs"""
+    df = parse_log_file(log_file)
+    return df, df.attrs[START_PARAMS_ATTR]
 
 def analyze_experiment(experiment_dir):
     """Analyze all log files in an experiment directory"""
-    log_files = glob.glob(f"{experiment_dir}/machine_*.log")
+    log_files = find_log_files(experiment_dir)
     if not log_files:
         print(f"No log files found in {experiment_dir}")
         return
@@ -43,30 +334,23 @@ def analyze_experiment(experiment_dir):
     print(f"Found {len(log_files)} log files")
     
     # Parse all log files
-    machine_data = {}
-    for log_file in log_files:
-        machine_id = int(os.path.basename(log_file).split('_')[1].split('.')[0])
-        df = parse_log_file(log_file)
-        machine_data[machine_id] = df
+    machine_data = parse_log_files(log_files)
+    
+    # Pull the numeric columns out as NumPy arrays once; the analysis and
+    # plots below index these directly instead of going through pandas
+    timestamps = {machine_id: df['timestamp'].to_numpy() for machine_id, df in machine_data.items()}
+    logical_clocks = {machine_id: df['logical_clock'].to_numpy() for machine_id, df in machine_data.items()}
+    queue_sizes = {machine_id: df['queue_size'].to_numpy() for machine_id, df in machine_data.items()}
     
     # Extract clock rates
     clock_rates = {}
     internal_probs = {}
     for machine_id, df in machine_data.items():
-        start_row = df[df['event_type'] == 'START']
-        if not start_row.empty:
-            additional_info = start_row.iloc[0]['additional_info']
-            # Extract parameters from the additional_info field
-            if additional_info:
-                # Handle both comma and semicolon separated parameters for backward compatibility
-                params = additional_info.replace(',', ';').split(';')
-                for param in params:
-                    if '=' in param:
-                        key, value = param.split('=')
-                        if key.strip() == 'clock_rate':
-                            clock_rates[machine_id] = int(value)
-                        elif key.strip() == 'internal_prob':
-                            internal_probs[machine_id] = float(value)
+        params = df.attrs[START_PARAMS_ATTR]
+        if 'clock_rate' in params:
+            clock_rates[machine_id] = int(params['clock_rate'])
+        if 'internal_prob' in params:
+            internal_probs[machine_id] = float(params['internal_prob'])
     
     print("\nMachine Clock Rates:")
     for machine_id, rate in clock_rates.items():
@@ -79,101 +363,103 @@ def analyze_experiment(experiment_dir):
     
     # Analyze logical clock jumps
     print("\nLogical Clock Jumps:")
-    for machine_id, df in machine_data.items():
-        jumps = []
-        for i in range(1, len(df)):
-            prev_clock = df.iloc[i-1]['logical_clock']
-            curr_clock = df.iloc[i]['logical_clock']
-            jump = curr_clock - prev_clock
-            if jump > 1:
-                jumps.append(jump)
+    for machine_id, clocks in logical_clocks.items():
+        deltas = np.diff(clocks)
+        jumps = deltas[deltas > 1]
         
-        if jumps:
-            avg_jump = sum(jumps) / len(jumps)
-            max_jump = max(jumps)
-            print(f"Machine {machine_id}: {len(jumps)} jumps, Avg: {avg_jump:.2f}, Max: {max_jump}")
+        if jumps.size:
+            avg_jump = jumps.mean()
+            max_jump = jumps.max()
+            print(f"Machine {machine_id}: {jumps.size} jumps, Avg: {avg_jump:.2f}, Max: {max_jump}")
         else:
             print(f"Machine {machine_id}: No jumps detected")
     
     # Analyze queue sizes
     print("\nMessage Queue Analysis:")
-    for machine_id, df in machine_data.items():
-        avg_queue = df['queue_size'].mean()
-        max_queue = df['queue_size'].max()
+    for machine_id, sizes in queue_sizes.items():
+        avg_queue = sizes.mean()
+        max_queue = sizes.max()
         print(f"Machine {machine_id}: Avg queue size: {avg_queue:.2f}, Max: {max_queue}")
     
     # Analyze clock drift
     print("\nLogical Clock Drift Analysis:")
     # Create a common timeline
-    min_time = min(df['timestamp'].min() for df in machine_data.values())
-    max_time = max(df['timestamp'].max() for df in machine_data.values())
+    min_time = min(ts.min() for ts in timestamps.values())
+    max_time = max(ts.max() for ts in timestamps.values())
     
     # Sample points for comparison
     sample_points = np.linspace(min_time, max_time, 10)
     
     # Interpolate logical clock values at sample points
-    clock_values = defaultdict(list)
-    for point in sample_points:
-        for machine_id, df in machine_data.items():
-            # Find closest timestamp
-            closest_idx = (df['timestamp'] - point).abs().idxmin()
-            clock_values[machine_id].append(df.loc[closest_idx, 'logical_clock'])
+    clock_values = np.empty((len(machine_data), len(sample_points)), dtype=np.int64)
+    for row, machine_id in enumerate(machine_data):
+        closest_idx = nearest_indices(timestamps[machine_id], sample_points)
+        clock_values[row] = logical_clocks[machine_id][closest_idx]
     
     # Calculate drift between machines
-    for i in range(len(sample_points)):
-        point_time = sample_points[i]
-        values = [clock_values[machine_id][i] for machine_id in sorted(machine_data.keys())]
-        max_diff = max(values) - min(values)
+    drift = clock_values.max(axis=0) - clock_values.min(axis=0)
+    for point_time, max_diff in zip(sample_points, drift):
         print(f"At {point_time:.2f}s: Max drift between machines: {max_diff}")
     
     # Generate plots
     plot_dir = f"{experiment_dir}/plots"
     os.makedirs(plot_dir, exist_ok=True)
     
+    # Draw every plot on one reused figure rather than allocating a new canvas each time
+    fig, ax = plt.subplots(figsize=(12, 6))
+    
     # Plot logical clocks over time
-    plt.figure(figsize=(12, 6))
-    for machine_id, df in machine_data.items():
-        plt.plot(df['timestamp'] - min_time, df['logical_clock'], 
-                 label=f"Machine {machine_id} (Rate: {clock_rates.get(machine_id, 'Unknown')})")
+    for machine_id in machine_data:
+        ax.plot(timestamps[machine_id] - min_time, logical_clocks[machine_id], 
+                label=f"Machine {machine_id} (Rate: {clock_rates.get(machine_id, 'Unknown')})")
     
-    plt.xlabel('Time (seconds)')
-    plt.ylabel('Logical Clock Value')
-    plt.title('Logical Clock Progression')
-    plt.legend()
-    plt.grid(True)
-    plt.savefig(f"{plot_dir}/logical_clocks.png")
+    ax.set_xlabel('Time (seconds)')
+    ax.set_ylabel('Logical Clock Value')
+    ax.set_title('Logical Clock Progression')
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(f"{plot_dir}/logical_clocks.png", dpi=PLOT_DPI)
+    ax.clear()
     
     # Plot queue sizes over time
-    plt.figure(figsize=(12, 6))
-    for machine_id, df in machine_data.items():
-        plt.plot(df['timestamp'] - min_time, df['queue_size'], 
-                 label=f"Machine {machine_id} (Rate: {clock_rates.get(machine_id, 'Unknown')})")
-    
-    plt.xlabel('Time (seconds)')
-    plt.ylabel('Queue Size')
-    plt.title('Message Queue Sizes')
-    plt.legend()
-    plt.grid(True)
-    plt.savefig(f"{plot_dir}/queue_sizes.png")
-    
-    # Plot event distribution
-    plt.figure(figsize=(12, 6))
-    for machine_id, df in machine_data.items():
-        event_counts = df['event_type'].value_counts()
-        plt.bar(
-            [f"{event} (M{machine_id})" for event in event_counts.index], 
-            event_counts.values,
+    for machine_id in machine_data:
+        ax.plot(timestamps[machine_id] - min_time, queue_sizes[machine_id], 
+                label=f"Machine {machine_id} (Rate: {clock_rates.get(machine_id, 'Unknown')})")
+    
+    ax.set_xlabel('Time (seconds)')
+    ax.set_ylabel('Queue Size')
+    ax.set_title('Message Queue Sizes')
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(f"{plot_dir}/queue_sizes.png", dpi=PLOT_DPI)
+    ax.clear()
+    
+    # Plot event distribution, grouping each machine's bars by event type
+    event_counts = np.zeros((len(machine_data), len(EVENT_TYPES)), dtype=np.int64)
+    for row, df in enumerate(machine_data.values()):
+        codes = df['event_type'].cat.codes.to_numpy()
+        event_counts[row] = np.bincount(codes[codes >= 0], minlength=len(EVENT_TYPES))
+    present = np.flatnonzero(event_counts.sum(axis=0))
+    positions = np.arange(len(present))
+    width = 0.8 / len(machine_data)
+    for row, machine_id in enumerate(machine_data):
+        ax.bar(
+            positions + (row - (len(machine_data) - 1) / 2) * width,
+            event_counts[row, present],
+            width,
             alpha=0.7,
             label=f"Machine {machine_id}"
         )
     
-    plt.xlabel('Event Type')
-    plt.ylabel('Count')
-    plt.title('Event Distribution')
-    plt.xticks(rotation=45)
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(f"{plot_dir}/event_distribution.png")
+    ax.set_xticks(positions)
+    ax.set_xticklabels([EVENT_TYPES[code] for code in present], rotation=45)
+    ax.set_xlabel('Event Type')
+    ax.set_ylabel('Count')
+    ax.set_title('Event Distribution')
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(f"{plot_dir}/event_distribution.png", dpi=PLOT_DPI)
+    plt.close(fig)
     
     print(f"\nPlots saved to {plot_dir}")
 
@@ -181,9 +467,16 @@ def main():
     if len(sys.argv) < 2:
         print("Usage: python analyze_logs.py <experiment_dir> [experiment_dir2 ...]")
         print("       python analyze_logs.py all")
+        print("       python analyze_logs.py convert <experiment_dir|all> [...]")
+        sys.exit(1)
+    
+    convert = sys.argv[1] == "convert"
+    args = sys.argv[2:] if convert else sys.argv[1:]
+    if not args:
+        print("Usage: python analyze_logs.py convert <experiment_dir|all> [...]")
         sys.exit(1)
     
-    if sys.argv[1] == "all":
+    if args[0] == "all":
         # Analyze all experiment directories
         experiment_dirs = glob.glob("logs/*/")
         if not experiment_dirs:
@@ -191,13 +484,23 @@ def main():
             sys.exit(1)
     else:
         # Analyze specified experiment directories
-        experiment_dirs = sys.argv[1:]
+        experiment_dirs = args
         # Ensure all directories exist
         for exp_dir in experiment_dirs:
             if not os.path.isdir(exp_dir):
                 print(f"Directory not found: {exp_dir}")
                 sys.exit(1)
     
+    if convert:
+        try:
+            for exp_dir in experiment_dirs:
+                convert_experiment(exp_dir)
+        except ImportError as e:
+            print(f"Converting logs to Parquet requires pyarrow: {e}")
+            sys.exit(1)
+        print("\nConversion complete!")
+        return
+    
     for exp_dir in experiment_dirs:
         analyze_experiment(exp_dir)
     
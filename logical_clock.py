@@ -5,48 +5,190 @@ import time
 import random
 import os
 import sys
-import queue
-import logging
-from datetime import datetime
+import collections
+import selectors
+import struct
+import signal
+
+# Wire format of a clock message: one little-endian unsigned 32-bit integer
+MESSAGE_FORMAT = '<I'
+MESSAGE_STRUCT = struct.Struct(MESSAGE_FORMAT)
+MESSAGE_SIZE = MESSAGE_STRUCT.size
+
+# Size of the per-connection receive buffer and the kernel send/receive buffers we ask for
+RECV_BUFFER_SIZE = 64 * 1024
+SOCKET_RCVBUF_SIZE = 1 << 20
+SOCKET_SNDBUF_SIZE = 1 << 20
+
+# How often the I/O loop wakes up to check whether the machine is still running
+SELECT_TIMEOUT = 0.1
+
+# How many times to try connecting to each peer before giving up
+CONNECT_RETRIES = 10
+
+# Default pause in seconds between connection attempts
+CONNECT_RETRY_INTERVAL = 1.0
+
+# Real-time priority requested for each machine process (where permitted)
+SCHED_FIFO_PRIORITY = 10
+
+# Event codes returned by _pick_event
+EVENT_INTERNAL = 0
+EVENT_SEND_ONE = 1
+EVENT_SEND_ALL = 2
+
+# Outcomes of the per-tick random draw: 0 is an internal event, 1-3 are communication types
+EVENT_DRAWS = (0, 1, 2, 3)
+
+def _tune_socket(sock, buffer_option, buffer_size):
+    """
+    Disable Nagle's algorithm and enlarge one kernel buffer on a peer socket.
+    
+    Clock messages are only a few bytes, so without TCP_NODELAY they can sit
+    in the kernel waiting to be coalesced. Each option is tried on its own
+    and failures are ignored since both are only tuning; AF_UNIX sockets,
+    for one, reject TCP_NODELAY but still take the buffer size.
+    
+    Args:
+        sock: The connected (or about to connect) socket
+        buffer_option: socket.SO_SNDBUF or socket.SO_RCVBUF
+        buffer_size (int): Requested buffer size in bytes
+    """
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, buffer_option, buffer_size)
+    except OSError:
+        pass
+
+def _clock_update(current, received):
+    """Apply Lamport's receive rule to the local clock"""
+    return max(current, received) + 1
+
+def _event_cum_weights(internal_prob):
+    """
+    Cumulative weights for drawing from EVENT_DRAWS.
+    
+    Draw 0 is an internal event with probability internal_prob; the remaining
+    probability space is split into 3 equal parts for communication types 1-3.
+    """
+    p = min(max(internal_prob, 0.0), 1.0)
+    c = (1.0 - p) / 3
+    return (p, p + c, p + 2 * c, 1.0)
+
+def _pick_event(cum_weights, n_peers):
+    """
+    Choose the next random event for a machine with no pending messages.
+    
+    Args:
+        cum_weights (tuple): Cumulative weights from _event_cum_weights
+        n_peers (int): Number of connected peers
+    
+    Returns:
+        tuple: (event code, target peer index or -1)
+    """
+    # One weighted draw picks internal (0) or communication type 1, 2 or 3
+    comm_type = random.choices(EVENT_DRAWS, cum_weights=cum_weights)[0]
+    
+    # Note that we can just replace comm_type 1 and 2 with a random number generator between all peers
+    # This gives the same behavior (same distribution)
+    if comm_type == 1 and n_peers:
+        # Send to one random peer
+        return EVENT_SEND_ONE, random.randint(0, n_peers - 1)
+    elif comm_type == 2 and n_peers >= 2:
+        # Send to another random peer (different from first if possible)
+        return EVENT_SEND_ONE, random.randint(0, n_peers - 1)
+    elif comm_type == 3 and n_peers:
+        # Send to all peers
+        return EVENT_SEND_ALL, -1
+    # Internal event, or fallback to internal event if no peers available
+    return EVENT_INTERNAL, -1
+
+class EventLog:
+    """
+    Append-only writer for a machine's event log.
+    
+    Lines are encoded once and written straight into a buffered binary file,
+    skipping the LogRecord/Formatter work of the logging module. Only the
+    main loop of a machine writes events, so no lock is needed. The file is
+    opened on the first event and must be closed to flush the buffer.
+    """
+    def __init__(self, log_file, buffer_size=64 * 1024):
+        self.log_file = log_file
+        self.buffer_size = buffer_size
+        self._file = None
+    
+    def info(self, line):
+        """Write one event line"""
+        if self._file is None:
+            self._file = open(self.log_file, 'ab', buffering=self.buffer_size)
+        self._file.write(f"{line}\n".encode())
+    
+    def close(self):
+        """Flush buffered events and close the file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class PeerConnection:
+    """An inbound peer connection and its receive buffer"""
+    def __init__(self, sock):
+        self.socket = sock
+        # Receive straight into one preallocated buffer; only a partial
+        # message is ever carried over between reads
+        self.buffer = bytearray(RECV_BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
 
 class VirtualMachine:
-    def __init__(self, machine_id, clock_rate, port, peer_ports):
+    def __init__(self, machine_id, clock_rate, port, peer_ports, family=socket.AF_INET):
         """
         Initialize a virtual machine with a specific ID, clock rate, and communication ports.
         
         Args:
             machine_id (int): Unique identifier for this machine
             clock_rate (int): Number of clock ticks per second (1-6)
-            port (int): Port this machine listens on
-            peer_ports (list): Ports of other machines to connect to
+            port (int): Port this machine listens on (a socket path for AF_UNIX)
+            peer_ports (list): Ports (or socket paths) of other machines to connect to
+            family: Socket address family, socket.AF_INET or socket.AF_UNIX
         """
         self.machine_id = machine_id
         self.clock_rate = clock_rate
+        self._tick_interval = 1.0 / clock_rate
         self.port = port
         self.peer_ports = peer_ports
+        self.family = family
         self.logical_clock = 0
-        self.message_queue = queue.Queue()
+        self.message_queue = collections.deque()
         self.running = False
         self.peers = []
+        self.selector = None
+        
+        # Set while every peer is connected to us, and whenever messages are
+        # queued (cleared again once the queue is empty), so callers can
+        # wait for these instead of sleeping. Only live connections count, so
+        # a port probe that connects and hangs up does not stand in for a peer.
+        self.connected_event = threading.Event()
+        self.message_arrived = threading.Event()
+        self._connection_count = 0
+        self.connect_retry_interval = CONNECT_RETRY_INTERVAL
         
         # Get experiment parameters from environment variables
         self.internal_event_prob = self._get_internal_event_prob()
+        self._event_cum_weights = _event_cum_weights(self.internal_event_prob)
         
         # Set up logging
         log_dir = "logs"
         os.makedirs(log_dir, exist_ok=True)
         log_file = f"{log_dir}/machine_{machine_id}.log"
-        logging.basicConfig(
-            filename=log_file,
-            level=logging.INFO,
-            format='%(message)s'
-        )
-        self.logger = logging.getLogger(f"Machine_{machine_id}")
+        self.logger = EventLog(log_file)
         
         # Set up socket server
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket = socket.socket(self.family, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('localhost', self.port))
+        self.server_socket.bind(self._address(self.port))
         self.server_socket.listen(5)
         
     def _get_internal_event_prob(self):
@@ -60,55 +202,127 @@ class VirtualMachine:
         # Default probability (7/10 for internal events in the original spec)
         return 0.7
         
+    def _address(self, port):
+        """Return the socket address for a port, which is itself the path for AF_UNIX"""
+        if self.family == socket.AF_INET:
+            return ('localhost', port)
+        return port
+        
     def connect_to_peers(self):
         """Connect to all peer machines"""
         for peer_port in self.peer_ports:
-            max_retries = 10
+            max_retries = CONNECT_RETRIES
             retry_count = 0
             while retry_count < max_retries:
                 try:
-                    peer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    peer_socket.connect(('localhost', peer_port))
+                    peer_socket = socket.socket(self.family, socket.SOCK_STREAM)
+                    _tune_socket(peer_socket, socket.SO_SNDBUF, SOCKET_SNDBUF_SIZE)
+                    peer_socket.connect(self._address(peer_port))
                     self.peers.append(peer_socket)
                     print(f"Machine {self.machine_id} connected to peer on port {peer_port}")
                     break
-                except ConnectionRefusedError:
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # A Unix socket path does not exist until its peer binds
                     retry_count += 1
                     print(f"Connection to port {peer_port} refused, retrying ({retry_count}/{max_retries})...")
-                    time.sleep(1)
+                    time.sleep(self.connect_retry_interval)
             if retry_count == max_retries:
                 print(f"Failed to connect to peer on port {peer_port} after {max_retries} attempts")
     
     def accept_connections(self):
-        """Accept incoming connections from peers"""
-        while self.running:
-            try:
-                client_socket, addr = self.server_socket.accept()
-                threading.Thread(target=self.handle_client, args=(client_socket,), daemon=True).start()
-            except Exception as e:
-                if self.running:  # Only log if we're still supposed to be running
-                    print(f"Error accepting connection: {e}")
+        """
+        Service all peer sockets from a single I/O thread.
+        
+        The server socket and every accepted connection are registered with
+        one selector (epoll on Linux); new connections are accepted and ready
+        connections are read as events arrive, instead of parking a thread in
+        recv for each peer.
+        """
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server_socket, selectors.EVENT_READ)
+        try:
+            while self.running:
+                for key, _ in self.selector.select(timeout=SELECT_TIMEOUT):
+                    if key.data is None:
+                        self._accept_connection()
+                    else:
+                        self.handle_client(key.data)
+        except Exception as e:
+            if self.running:  # Only log if we're still supposed to be running
+                print(f"Error in I/O loop: {e}")
+        finally:
+            for key in list(self.selector.get_map().values()):
+                if key.data is not None:
+                    self._close_connection(key.data)
+            self.selector.close()
     
-    def handle_client(self, client_socket):
-        """Handle messages from a connected peer"""
-        while self.running:
-            try:
-                data = client_socket.recv(1024)
-                if not data:
-                    break
-                
-                # Parse the received logical clock time
-                received_time = int(data.decode().strip())
-                
-                # Add to message queue
-                self.message_queue.put(received_time)
-            except Exception as e:
-                if self.running:  # Only log if we're still supposed to be running
-                    print(f"Error handling client: {e}")
-                break
+    def _accept_connection(self):
+        """Accept a pending connection and register it with the selector"""
+        try:
+            client_socket, addr = self.server_socket.accept()
+        except Exception as e:
+            if self.running:  # Only log if we're still supposed to be running
+                print(f"Error accepting connection: {e}")
+            return
+        # Let the kernel absorb bursts so each recv drains many messages
+        _tune_socket(client_socket, socket.SO_RCVBUF, SOCKET_RCVBUF_SIZE)
+        self.selector.register(client_socket, selectors.EVENT_READ, PeerConnection(client_socket))
+        self._connection_count += 1
+        if self._connection_count >= len(self.peer_ports):
+            self.connected_event.set()
+    
+    def handle_client(self, connection):
+        """
+        Read whatever a connected peer has sent and queue the complete messages.
+        
+        Args:
+            connection (PeerConnection): The peer's socket and receive buffer
+        
+        Returns:
+            bool: False once the connection has been closed
+        """
+        try:
+            n = connection.socket.recv_into(connection.view[connection.filled:])
+        except Exception as e:
+            if self.running:  # Only log if we're still supposed to be running
+                print(f"Error handling client: {e}")
+            n = 0
+        if not n:
+            self._close_connection(connection)
+            return False
+        filled = connection.filled + n
+        
+        # Messages are fixed-size; one recv may hold several
+        # messages or only part of one. Queue the received logical clock
+        # times of all complete messages in one pass.
+        offset = filled - filled % MESSAGE_SIZE
+        if offset:
+            self.message_queue.extend(
+                received_time for (received_time,) in MESSAGE_STRUCT.iter_unpack(connection.view[:offset])
+            )
+            self.message_arrived.set()
         
+        # Move the leftover partial message to the front
+        leftover = filled - offset
+        if offset and leftover:
+            connection.view[:leftover] = connection.view[offset:filled]
+        connection.filled = leftover
+        return True
+    
+    def _close_connection(self, connection):
+        """Stop watching a peer connection and close it"""
+        if self.selector is not None:
+            try:
+                self.selector.unregister(connection.socket)
+            except (KeyError, ValueError):
+                pass
+            else:
+                # Only connections that were still registered are counted
+                self._connection_count -= 1
+                if self._connection_count < len(self.peer_ports):
+                    self.connected_event.clear()
         try:
-            client_socket.close()
+            connection.socket.close()
         except:
             pass
     
@@ -128,32 +342,42 @@ class VirtualMachine:
         else:
             targets = [self.peers[i] for i in target_indices if i < len(self.peers)]
         
-        # Send message to each target
+        # Send message to each target, encoding it only once
+        message = MESSAGE_STRUCT.pack(self.logical_clock)
         for peer_socket in targets:
             try:
-                message = str(self.logical_clock)
-                peer_socket.sendall(message.encode())
+                peer_socket.sendall(message)
             except Exception as e:
                 print(f"Error sending message: {e}")
         
         # Log the send event
         target_str = "all peers" if target_indices is None else f"peer(s) {target_indices}"
-        self.logger.info(f"SEND,{datetime.now().timestamp()},{self.message_queue.qsize()},{self.logical_clock},{target_str}")
+        self.logger.info(f"SEND,{time.time()},{len(self.message_queue)},{self.logical_clock},{target_str}")
     
     def process_internal_event(self):
         """Process an internal event, updating the logical clock"""
         self.logical_clock += 1
-        self.logger.info(f"INTERNAL,{datetime.now().timestamp()},{self.message_queue.qsize()},{self.logical_clock}")
+        self.logger.info(f"INTERNAL,{time.time()},{len(self.message_queue)},{self.logical_clock}")
     
     def process_message(self):
         """Process a message from the queue, updating the logical clock"""
-        if not self.message_queue.empty():
-            received_time = self.message_queue.get()
-            # Update logical clock according to Lamport's rule
-            self.logical_clock = max(self.logical_clock, received_time) + 1
-            self.logger.info(f"RECEIVE,{datetime.now().timestamp()},{self.message_queue.qsize()},{self.logical_clock}")
-            return True
-        return False
+        # deque.popleft is atomic under the GIL, so this is safe against
+        # handle_client threads appending concurrently. Clear the arrival
+        # flag before taking a message and set it again if any are left, so
+        # a message queued meanwhile is never missed.
+        if self.message_arrived.is_set():
+            self.message_arrived.clear()
+        try:
+            received_time = self.message_queue.popleft()
+        except IndexError:
+            return False
+        if self.message_queue:
+            self.message_arrived.set()
+        
+        # Update logical clock according to Lamport's rule
+        self.logical_clock = _clock_update(self.logical_clock, received_time)
+        self.logger.info(f"RECEIVE,{time.time()},{len(self.message_queue)},{self.logical_clock}")
+        return True
     
     def run(self):
         """Run the virtual machine's main loop"""
@@ -168,57 +392,64 @@ class VirtualMachine:
         
         # Log initial state with experiment parameters
         params = f"clock_rate={self.clock_rate};internal_prob={self.internal_event_prob}"
-        self.logger.info(f"START,{datetime.now().timestamp()},0,{self.logical_clock},{params}")
+        self.logger.info(f"START,{time.time()},0,{self.logical_clock},{params}")
+        
+        # Ticks are scheduled against absolute deadlines so time spent
+        # handling an event is not added on top of the sleep
+        sleep_time = self._tick_interval
+        
+        # Everything the loop touches on every tick is looked up once here;
+        # the peer list is fixed once connect_to_peers has returned
+        process_message = self.process_message
+        send_message = self.send_message
+        process_internal_event = self.process_internal_event
+        cum_weights = self._event_cum_weights
+        n_peers = len(self.peers)
+        monotonic = time.monotonic
+        sleep = time.sleep
+        
+        next_tick = monotonic()
         
         try:
             while self.running:
-                # Calculate sleep time based on clock rate
-                sleep_time = 1.0 / self.clock_rate
-                
                 # Process a message if available
-                if not self.process_message():
+                if not process_message():
                     # If no message, generate random event
-                    rand_val = random.random()
-                    
-                    # Determine if this is an internal event based on probability
-                    if rand_val < self.internal_event_prob:
-                        # Internal event
-                        self.process_internal_event()
+                    event, target_idx = _pick_event(cum_weights, n_peers)
+                    if event == EVENT_SEND_ONE:
+                        send_message([target_idx])
+                    elif event == EVENT_SEND_ALL:
+                        send_message()
                     else:
-                        # Communication event - determine type (1, 2, or 3)
-                        # Scale the remaining probability space (1 - internal_prob) into 3 equal parts
-                        comm_type = random.randint(1, 3)
-                        
-                        # Note that we can just replace comm_type 1 and 2 with a random number generator between all peers
-                        # This gives the same behavior (same distribution)
-                        if comm_type == 1 and self.peers:
-                            # Send to one random peer
-                            target_idx = random.randint(0, len(self.peers) - 1)
-                            self.send_message([target_idx])
-                        elif comm_type == 2 and len(self.peers) >= 2:
-                            # Send to another random peer (different from first if possible)
-                            target_idx = random.randint(0, len(self.peers) - 1)
-                            self.send_message([target_idx])
-                        elif comm_type == 3 and self.peers:
-                            # Send to all peers
-                            self.send_message()
-                        else:
-                            # Fallback to internal event if no peers available
-                            self.process_internal_event()
+                        process_internal_event()
                 
-                # Sleep according to clock rate
-                time.sleep(sleep_time)
+                # Sleep until the next tick; if we have fallen behind, start
+                # counting from now instead of bursting to catch up
+                next_tick += sleep_time
+                delay = next_tick - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                else:
+                    next_tick -= delay
         
         except KeyboardInterrupt:
             print(f"Machine {self.machine_id} shutting down...")
         finally:
             self.running = False
             self.server_socket.close()
+            # A Unix socket's path outlives the socket and would make the
+            # next bind to it fail
+            if self.family != socket.AF_INET:
+                try:
+                    os.unlink(self.port)
+                except OSError:
+                    pass
             for peer in self.peers:
                 try:
                     peer.close()
                 except:
                     pass
+            self.logger.close()
             print(f"Machine {self.machine_id} shutdown complete")
 
 def start_machine(machine_id, clock_rate, port, peer_ports):
@@ -226,7 +457,37 @@ def start_machine(machine_id, clock_rate, port, peer_ports):
     vm = VirtualMachine(machine_id, clock_rate, port, peer_ports)
     vm.run()
 
+def _pin_process(machine_id):
+    """
+    Pin this process to one CPU and ask for real-time scheduling, so tick
+    spacing is not disturbed by the OS scheduler.
+    
+    Both are best effort: they are Linux-only and real-time priority
+    usually needs extra privileges.
+    
+    Args:
+        machine_id (int): Used to pick the CPU, so machines spread across cores
+    """
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[machine_id % len(cpus)]})
+    except (AttributeError, OSError):
+        pass
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(SCHED_FIFO_PRIORITY))
+    except (AttributeError, OSError):
+        pass
+
+def _handle_sigterm(signum, frame):
+    """Turn SIGTERM into KeyboardInterrupt so the run loop shuts down cleanly"""
+    raise KeyboardInterrupt
+
 def main(machine_id, base_port, num_machines):
+    # run_system stops machines with SIGTERM; shut down through the same
+    # path as Ctrl-C so buffered log events are flushed
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    _pin_process(machine_id)
+    
     # Calculate ports for all machines
     all_ports = [base_port + i for i in range(num_machines)]
     
@@ -2,10 +2,97 @@
 import subprocess
 import sys
 import time
-import signal
 import os
+import socket
+import multiprocessing
+import logical_clock
 
-def run_system(num_machines=3, base_port=8000, duration=60):
+def wait_for_port(port, process=None, timeout=10.0):
+    """
+    Wait until a machine is accepting connections on a localhost port.
+    
+    Args:
+        port (int): Port the machine listens on
+        process (subprocess.Popen, optional): Stop waiting if this process exits
+        timeout (float): Maximum time to wait in seconds
+    
+    Returns:
+        bool: True if the port accepted a connection before the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('localhost', port), timeout=0.05):
+                return True
+        except OSError:
+            time.sleep(0.01)
+    return False
+
+def popen_launcher(machine_id, base_port, num_machines, env=None):
+    """
+    Start a machine in a fresh Python interpreter.
+    
+    Args:
+        machine_id (int): ID of the machine to start
+        base_port (int): Base port number for communication
+        num_machines (int): Total number of machines in the system
+        env (dict, optional): Environment for the machine process
+    
+    Returns:
+        subprocess.Popen: The running machine process
+    """
+    cmd = ["python", "logical_clock.py", str(machine_id), str(base_port), str(num_machines)]
+    if env is None:
+        return subprocess.Popen(cmd)
+    return subprocess.Popen(cmd, env=env)
+
+class ForkedMachine:
+    """Gives a forked multiprocessing.Process the Popen methods run_system uses"""
+    def __init__(self, process):
+        self.process = process
+        self.pid = process.pid
+    
+    def poll(self):
+        return self.process.exitcode
+    
+    def terminate(self):
+        self.process.terminate()
+    
+    def wait(self):
+        self.process.join()
+        return self.process.exitcode
+
+def _run_forked_machine(machine_id, base_port, num_machines, env):
+    """Entry point of a forked machine process"""
+    if env is not None:
+        os.environ.clear()
+        os.environ.update(env)
+    logical_clock.main(machine_id, base_port, num_machines)
+
+def fork_launcher(machine_id, base_port, num_machines, env=None):
+    """
+    Start a machine by forking this process (Unix only).
+    
+    The child already has logical_clock imported, so this skips starting
+    and initializing a new interpreter for every machine.
+    
+    Args:
+        machine_id (int): ID of the machine to start
+        base_port (int): Base port number for communication
+        num_machines (int): Total number of machines in the system
+        env (dict, optional): Environment for the machine process
+    
+    Returns:
+        ForkedMachine: The running machine process
+    """
+    context = multiprocessing.get_context('fork')
+    process = context.Process(target=_run_forked_machine, args=(machine_id, base_port, num_machines, env))
+    process.start()
+    return ForkedMachine(process)
+
+def run_system(num_machines=3, base_port=8000, duration=60, launcher=popen_launcher):
     """
     Run a distributed system with multiple virtual machines.
     
@@ -13,6 +100,7 @@ def run_system(num_machines=3, base_port=8000, duration=60):
         num_machines (int): Number of virtual machines to run
         base_port (int): Base port number for communication
         duration (int): Duration to run the system in seconds
+        launcher (callable): Starts one machine, e.g. popen_launcher or fork_launcher
     """
     # Create logs directory if it doesn't exist
     os.makedirs("logs", exist_ok=True)
@@ -20,12 +108,12 @@ def run_system(num_machines=3, base_port=8000, duration=60):
     # Start each machine as a separate process
     processes = []
     for i in range(num_machines):
-        cmd = ["python", "logical_clock.py", str(i), str(base_port), str(num_machines)]
-        process = subprocess.Popen(cmd)
+        process = launcher(i, base_port, num_machines)
         processes.append(process)
         print(f"Started machine {i} (PID: {process.pid})")
-        # Small delay to allow each machine to start listening before the next one tries to connect
-        time.sleep(0.5)
+        # Wait for each machine to start listening before the next one tries to connect
+        if not wait_for_port(base_port + i, process):
+            print(f"Machine {i} is not accepting connections on port {base_port + i}")
     
     print(f"\nRunning system with {num_machines} machines for {duration} seconds...")
     try:
@@ -51,7 +139,7 @@ def run_system(num_machines=3, base_port=8000, duration=60):
     print(f"Log files are available in the 'logs' directory.")
 
 def run_experiment(experiment_name, num_machines=3, base_port=8000, duration=60, 
-                  internal_event_prob=None, clock_rate_variation=None):
+                  internal_event_prob=None, clock_rate_variation=None, launcher=popen_launcher):
     """
     Run an experiment with specific parameters and save logs to a dedicated directory.
     
@@ -62,6 +150,7 @@ def run_experiment(experiment_name, num_machines=3, base_port=8000, duration=60,
         duration (int): Duration to run the system in seconds
         internal_event_prob (float, optional): Probability of internal events (0-1)
         clock_rate_variation (str, optional): Type of clock rate variation ("small" or "normal")
+        launcher (callable): Starts one machine, e.g. popen_launcher or fork_launcher
     """
     # Create experiment directory
     experiment_dir = f"logs/{experiment_name}"
@@ -77,12 +166,12 @@ def run_experiment(experiment_name, num_machines=3, base_port=8000, duration=60,
     # Start each machine as a separate process
     processes = []
     for i in range(num_machines):
-        cmd = ["python", "logical_clock.py", str(i), str(base_port), str(num_machines)]
-        process = subprocess.Popen(cmd, env=env)
+        process = launcher(i, base_port, num_machines, env=env)
         processes.append(process)
         print(f"Started machine {i} (PID: {process.pid})")
-        # Small delay to allow each machine to start listening before the next one tries to connect
-        time.sleep(0.5)
+        # Wait for each machine to start listening before the next one tries to connect
+        if not wait_for_port(base_port + i, process):
+            print(f"Machine {i} is not accepting connections on port {base_port + i}")
     
     print(f"\nRunning experiment '{experiment_name}' with {num_machines} machines for {duration} seconds...")
     try:
@@ -126,6 +215,7 @@ if __name__ == "__main__":
         print("  --duration=N     Duration in seconds (default: 60)")
         print("  --internal=0.X   Probability of internal events (0-1)")
         print("  --variation=TYPE Clock rate variation ('small' or 'normal')")
+        print("  --fork           Fork machines from this process instead of starting new interpreters")
         print("\nExample:")
         print("  python run_system.py run --machines=3 --duration=60")
         print("  python run_system.py run_all")
@@ -140,6 +230,7 @@ if __name__ == "__main__":
         duration = 60
         internal_event_prob = None
         clock_rate_variation = None
+        launcher = popen_launcher
         
         for arg in sys.argv[2:]:
             if arg.startswith("--machines="):
@@ -152,6 +243,8 @@ if __name__ == "__main__":
                 internal_event_prob = float(arg.split("=")[1])
             elif arg.startswith("--variation="):
                 clock_rate_variation = arg.split("=")[1]
+            elif arg == "--fork":
+                launcher = fork_launcher
         
         # Generate experiment name
         experiment_name = f"custom_m{num_machines}_d{duration}"
@@ -161,7 +254,7 @@ if __name__ == "__main__":
             experiment_name += f"_v{clock_rate_variation}"
         
         run_experiment(experiment_name, num_machines, base_port, duration, 
-                      internal_event_prob, clock_rate_variation)
+                      internal_event_prob, clock_rate_variation, launcher)
     
     elif command == "run_all":
         # Run all required experiments
@@ -1,8 +1,10 @@
 import unittest
 import sys
 import os
+import numpy as np
 import pandas as pd
 import tempfile
+import importlib.util
 from unittest.mock import patch, MagicMock
 
 # Add parent directory to path to import analyze_logs
@@ -54,23 +56,148 @@ class TestAnalyzeLogs(unittest.TestCase):
         self.assertEqual(len(df), 4)  # 4 log entries
         
         # Check that the columns are correct
-        expected_columns = ['event_type', 'timestamp', 'queue_size', 'logical_clock', 'additional_info']
+        expected_columns = ['event_type', 'timestamp', 'queue_size', 'logical_clock']
         self.assertListEqual(list(df.columns), expected_columns)
         
+        # Event types share one fixed set of categories across files
+        self.assertListEqual(list(df['event_type'].cat.categories), analyze_logs.EVENT_TYPES)
+        
         # Check the values of the first row
         first_row = df.iloc[0]
         self.assertEqual(first_row['event_type'], 'START')
         self.assertEqual(first_row['timestamp'], 1234567890.0)
         self.assertEqual(first_row['queue_size'], 0)
         self.assertEqual(first_row['logical_clock'], 0)
-        self.assertEqual(first_row['additional_info'], 'clock_rate=1;internal_prob=0.7')
+        
+        # Only the START line's parameters are kept, outside the table
+        self.assertDictEqual(df.attrs['start_params'], {'clock_rate': '1', 'internal_prob': '0.7'})
+
+    def test_parse_log_file_embedded_commas(self):
+        """Test parsing a log file whose additional info contains commas"""
+        log_file = os.path.join(self.test_dir.name, "machine_3.log")
+        with open(log_file, "w") as f:
+            f.write("START,1234567890.0,0,0,clock_rate=1,internal_prob=0.7\n")
+            f.write("SEND,1234567890.1,0,1,peer(s) [0, 1]\n")
+            f.write("INTERNAL,1234567890.2,0,2\n")
+
+        df = analyze_logs.parse_log_file(log_file)
+
+        self.assertEqual(len(df), 3)
+        self.assertListEqual(list(df['logical_clock']), [0, 1, 2])
+        self.assertDictEqual(df.attrs['start_params'], {'clock_rate': '1', 'internal_prob': '0.7'})
+
+    def test_parse_log_file_truncated_line(self):
+        """Test that a last line cut off by an interrupted write is skipped"""
+        log_file = os.path.join(self.test_dir.name, "machine_0.log")
+        with open(log_file) as f:
+            complete = f.read()
+        
+        for truncated in ("INTERNAL,1234567890.4", "INTERNAL,1234567890.4,0,", "INTERNAL,1."):
+            with self.subTest(truncated=truncated):
+                with open(log_file, "w") as f:
+                    f.write(complete + truncated)
+                
+                df = analyze_logs.parse_log_file(log_file)
+                
+                self.assertListEqual(list(df['logical_clock']), [0, 1, 2, 3])
+                self.assertDictEqual(df.attrs['start_params'], {'clock_rate': '1', 'internal_prob': '0.7'})
+    
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_convert_log_file(self):
+        """Test that a converted Parquet log round-trips and is preferred over the CSV log"""
+        log_file = os.path.join(self.test_dir.name, "machine_0.log")
+        parquet_file = analyze_logs.convert_log_file(log_file)
+        
+        self.assertEqual(parquet_file, os.path.join(self.test_dir.name, "machine_0.parquet"))
+        converted = analyze_logs.parse_log_file(parquet_file)
+        original = analyze_logs.parse_log_file(log_file)
+        pd.testing.assert_frame_equal(converted, original)
+        self.assertDictEqual(converted.attrs, original.attrs)
+        
+        columns = analyze_logs.parse_log_file(parquet_file, columns=['logical_clock'])
+        self.assertListEqual(list(columns.columns), ['logical_clock'])
+        
+        log_files = analyze_logs.find_log_files(self.test_dir.name)
+        self.assertEqual(log_files[0], parquet_file)
+        self.assertEqual(log_files[1], os.path.join(self.test_dir.name, "machine_1.log"))
     
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_parse_log_file_cache(self):
+        """Test that parsed logs are reused from the sidecar until the log changes"""
+        log_file = os.path.join(self.test_dir.name, "machine_0.log")
+        first = analyze_logs.parse_log_file(log_file)
+        self.assertTrue(os.path.exists(log_file + analyze_logs.CACHE_SUFFIX))
+        
+        # A second parse is served from the cache without touching the CSV parser
+        with patch('analyze_logs._read_log_csv') as mock_read:
+            cached = analyze_logs.parse_log_file(log_file)
+        mock_read.assert_not_called()
+        pd.testing.assert_frame_equal(cached, first)
+        self.assertDictEqual(cached.attrs, first.attrs)
+        
+        # The START parameters are stored in the sidecar's own metadata
+        import pyarrow.feather as feather
+        metadata = feather.read_table(log_file + analyze_logs.CACHE_SUFFIX).schema.metadata
+        self.assertIn(analyze_logs.START_PARAMS_FIELD, metadata)
+        
+        # Appending to the log invalidates the cache
+        with open(log_file, "a") as f:
+            f.write("INTERNAL,1234567890.4,0,4\n")
+        self.assertEqual(len(analyze_logs.parse_log_file(log_file)), 5)
+    
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_parse_log_file_corrupt_cache(self):
+        """Test that an unreadable sidecar is treated as a cache miss and replaced"""
+        log_file = os.path.join(self.test_dir.name, "machine_0.log")
+        cache_file = log_file + analyze_logs.CACHE_SUFFIX
+        for contents in (b"", b"ARROW1 truncated"):
+            with open(cache_file, "wb") as f:
+                f.write(contents)
+            
+            df = analyze_logs.parse_log_file(log_file)
+            
+            self.assertEqual(len(df), 4)
+            pd.testing.assert_frame_equal(analyze_logs._read_cached_log(log_file), df)
+        self.assertListEqual(sorted(os.listdir(self.test_dir.name)),
+                             ["machine_0.log", "machine_0.log" + analyze_logs.CACHE_SUFFIX,
+                              "machine_1.log", "machine_2.log"])
+    
+    def test_parse_log_files_parallel(self):
+        """Test that parsing in worker processes matches parsing in-process"""
+        log_files = analyze_logs.find_log_files(self.test_dir.name)
+        serial = analyze_logs.parse_log_files(log_files)
+        
+        with patch('analyze_logs.PARALLEL_PARSE_MIN_BYTES', 0):
+            parallel = analyze_logs.parse_log_files(log_files)
+        
+        self.assertListEqual(list(parallel), list(serial))
+        for machine_id, df in serial.items():
+            pd.testing.assert_frame_equal(parallel[machine_id], df)
+            self.assertDictEqual(parallel[machine_id].attrs, df.attrs)
+    
+    def test_find_log_files(self):
+        """Test that only machine logs are picked up, ordered by machine ID"""
+        for name in ("machine_10.log", "machine_0.log.feather", "notes.log"):
+            open(os.path.join(self.test_dir.name, name), "w").close()
+        
+        log_files = analyze_logs.find_log_files(self.test_dir.name)
+        
+        self.assertListEqual(list(log_files), [0, 1, 2, 10])
+        self.assertEqual(log_files[10], os.path.join(self.test_dir.name, "machine_10.log"))
+    
+    def test_nearest_indices(self):
+        """Test that sample points map to the closest timestamp"""
+        timestamps = np.array([0.0, 1.0, 2.0, 4.0])
+        points = np.array([-1.0, 0.4, 0.5, 0.6, 3.5, 10.0])
+        idx = analyze_logs.nearest_indices(timestamps, points)
+        self.assertListEqual(list(idx), [0, 0, 0, 1, 3, 3])
+
     def test_analyze_experiment(self):
         """Test analyzing an experiment directory"""
         # Patch plt.show to prevent plots from being displayed
         with patch('matplotlib.pyplot.show'):
             # Patch plt.savefig to prevent files from being saved
-            with patch('matplotlib.pyplot.savefig'):
+            with patch('matplotlib.figure.Figure.savefig'):
                 # Call analyze_experiment
                 analyze_logs.analyze_experiment(self.test_dir.name)
     
@@ -94,7 +221,7 @@ class TestAnalyzeLogs(unittest.TestCase):
             # Patch plt.show to prevent plots from being displayed
             with patch('matplotlib.pyplot.show'):
                 # Patch plt.savefig to prevent files from being saved
-                with patch('matplotlib.pyplot.savefig'):
+                with patch('matplotlib.figure.Figure.savefig'):
                     # Call main
                     analyze_logs.main()
 
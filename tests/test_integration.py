@@ -1,33 +1,35 @@
 import unittest
 import sys
 import os
-import time
 import threading
 import socket
-import queue
-import logging
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock
 
 # Add parent directory to path to import logical_clock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logical_clock import VirtualMachine
 
 class TestVirtualMachineIntegration(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Patch os.makedirs once for the whole class to prevent directory creation
+        cls.makedirs_patcher = patch('logical_clock.os.makedirs')
+        cls.mock_makedirs = cls.makedirs_patcher.start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.makedirs_patcher.stop()
+    
     def setUp(self):
-        # Patch logging to prevent actual file writes
-        self.logging_patcher = patch('logical_clock.logging')
-        self.mock_logging = self.logging_patcher.start()
-        
-        # Patch os.makedirs to prevent directory creation
-        self.makedirs_patcher = patch('logical_clock.os.makedirs')
-        self.mock_makedirs = self.makedirs_patcher.start()
-        
         # Create mock loggers
         self.mock_loggers = [MagicMock() for _ in range(3)]
         
         # Create virtual machines for testing
         self.vms = []
-        self.ports = [8000, 8001, 8002]
+        # Derive the ports from the process ID so parallel test processes
+        # (e.g. pytest -n auto) do not collide; each process owns a block of 10
+        base = 8000 + (os.getpid() % 1000) * 10
+        self.ports = [base, base + 1, base + 2]
         
         # Create VMs with real sockets but mock loggers
         for i in range(3):
@@ -38,6 +40,8 @@ class TestVirtualMachineIntegration(unittest.TestCase):
                 peer_ports=[p for p in self.ports if p != self.ports[i]]
             )
             vm.logger = self.mock_loggers[i]
+            # Retry refused connections quickly instead of once a second
+            vm.connect_retry_interval = 0.01
             self.vms.append(vm)
     
     def tearDown(self):
@@ -50,30 +54,38 @@ class TestVirtualMachineIntegration(unittest.TestCase):
                     peer.close()
                 except:
                     pass
-        
-        # Stop patchers
-        self.logging_patcher.stop()
-        self.makedirs_patcher.stop()
     
-    def test_vm_connections(self):
-        """Test that VMs can connect to each other"""
-        # Start server threads for each VM
-        server_threads = []
+    def start_and_connect(self):
+        """Start every VM's accept thread and connect all VMs to each other"""
+        # The server sockets already listen from __init__, so connecting can
+        # start right away; connect in parallel so retries do not stack up
         for vm in self.vms:
             vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
+            threading.Thread(target=vm.accept_connections, daemon=True).start()
+        connect_threads = [threading.Thread(target=vm.connect_to_peers) for vm in self.vms]
+        for thread in connect_threads:
             thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
+        for thread in connect_threads:
+            thread.join(2.0)
         
-        # Give connections time to establish
-        time.sleep(0.5)
+        # Wait until every VM has accepted both of its peers
+        for i, vm in enumerate(self.vms):
+            self.assertTrue(vm.connected_event.wait(2.0), f"VM {i} did not accept all peer connections")
+    
+    def wait_for_messages(self, vm_idx, count, timeout=1.0):
+        """Wait until the given VM has at least count messages queued"""
+        vm = self.vms[vm_idx]
+        while len(vm.message_queue) < count:
+            # Re-check after clearing so an arrival in between is not missed
+            vm.message_arrived.clear()
+            if len(vm.message_queue) >= count:
+                break
+            self.assertTrue(vm.message_arrived.wait(timeout),
+                            f"VM {vm_idx} did not receive {count} message(s)")
+    
+    def test_vm_connections(self):
+        """Test that VMs can connect to each other"""
+        self.start_and_connect()
         
         # Check that each VM has connected to the other two
         for vm in self.vms:
@@ -82,33 +94,18 @@ class TestVirtualMachineIntegration(unittest.TestCase):
     
     def test_message_sending_and_receiving(self):
         """Test that VMs can send and receive messages"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
+        self.start_and_connect()
         
         # Send a message from VM 0 to all peers
         self.vms[0].send_message()
         
-        # Give message time to be received
-        time.sleep(0.5)
+        # Wait for the message to be received
+        self.wait_for_messages(1, 1)
+        self.wait_for_messages(2, 1)
         
         # Check that VM 1 and VM 2 received the message
-        self.assertEqual(self.vms[1].message_queue.qsize(), 1)
-        self.assertEqual(self.vms[2].message_queue.qsize(), 1)
+        self.assertEqual(len(self.vms[1].message_queue), 1)
+        self.assertEqual(len(self.vms[2].message_queue), 1)
         
         # Process the messages
         self.vms[1].process_message()
@@ -122,67 +119,37 @@ class TestVirtualMachineIntegration(unittest.TestCase):
     
     def test_targeted_message_sending(self):
         """Test that VMs can send messages to specific peers"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
+        self.start_and_connect()
         
         # Send a message from VM 0 to VM 1 only
         self.vms[0].send_message([0])  # First peer is VM 1
         
-        # Give message time to be received
-        time.sleep(0.5)
+        # Wait for the message to be received
+        self.wait_for_messages(1, 1)
         
         # Check that VM 1 received the message but VM 2 did not
-        self.assertEqual(self.vms[1].message_queue.qsize(), 1)
-        self.assertEqual(self.vms[2].message_queue.qsize(), 0)
+        self.assertEqual(len(self.vms[1].message_queue), 1)
+        self.assertEqual(len(self.vms[2].message_queue), 0)
         print("FINISH_TARGETED_MESSAGE_SENDING")
     
     def test_multiple_message_exchange(self):
         """Test a sequence of message exchanges between VMs"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
+        self.start_and_connect()
         
-        # VM 0 sends to all
+        # VM 0 sends to all; wait for VM 2's copy too, so it is queued ahead
+        # of the message VM 1 sends next
         self.vms[0].send_message()
-        time.sleep(0.1)
+        self.wait_for_messages(1, 1)
+        self.wait_for_messages(2, 1)
         
         # VM 1 processes message and sends to VM 2
         self.vms[1].process_message()
         self.vms[1].send_message([1])  # Second peer is VM 2
-        time.sleep(0.1)
+        self.wait_for_messages(2, 2)
         
         # VM 2 processes both messages
-        self.vms[2].process_message()  # From VM 0
-        self.vms[2].process_message()  # From VM 1
+        self.assertTrue(self.vms[2].process_message())  # From VM 0
+        self.assertTrue(self.vms[2].process_message())  # From VM 1
         
         # Check final logical clock values
         self.assertEqual(self.vms[0].logical_clock, 1)  # Initial send
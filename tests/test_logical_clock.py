@@ -1,55 +1,293 @@
 import unittest
 import sys
 import os
-import time
-import threading
 import socket
-import queue
-import logging
-from unittest.mock import patch, MagicMock, call, ANY
+import collections
+import io
+import struct
+import tempfile
+from unittest.mock import patch, MagicMock
 
 # Add parent directory to path to import logical_clock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from logical_clock import VirtualMachine, start_machine
+import logical_clock
+from logical_clock import VirtualMachine, EventLog, PeerConnection, start_machine
+from logical_clock import _clock_update, _event_cum_weights, _pick_event, EVENT_INTERNAL, EVENT_SEND_ONE, EVENT_SEND_ALL
 
-class TestVirtualMachine(unittest.TestCase):
+def recv_into_from(chunks):
+    """Build a recv_into side effect that delivers the given byte chunks in order"""
+    chunks = iter(chunks)
+    def recv_into(view):
+        data = next(chunks)
+        view[:len(data)] = data
+        return len(data)
+    return recv_into
+
+class FakeSocket:
+    """A socket that records what was done to it instead of touching the network"""
+    __slots__ = ('address', 'backlog', 'connected', 'sockopts', 'close_count', 'connect_error')
+    
+    def __init__(self, connect_error=None):
+        self.address = None
+        self.backlog = None
+        self.connected = []
+        self.sockopts = []
+        self.close_count = 0
+        self.connect_error = connect_error
+    
+    def setsockopt(self, level, option, value):
+        self.sockopts.append((level, option, value))
+    
+    def bind(self, address):
+        self.address = address
+    
+    def listen(self, backlog):
+        self.backlog = backlog
+    
+    def connect(self, address):
+        self.connected.append(address)
+        if self.connect_error is not None:
+            raise self.connect_error
+    
+    def close(self):
+        self.close_count += 1
+
+class FakePeer:
+    """A connected peer socket that keeps the last message sent to it"""
+    __slots__ = ('sendall_args', 'closed', 'send_error')
+    
+    def __init__(self, send_error=None):
+        self.sendall_args = None
+        self.closed = False
+        self.send_error = send_error
+    
+    def sendall(self, data):
+        if self.send_error is not None:
+            raise self.send_error
+        self.sendall_args = data
+    
+    def close(self):
+        self.closed = True
+
+class FakeLogger:
+    """An EventLog that keeps the lines it is given in a list"""
+    __slots__ = ('lines', 'closed')
+    
+    def __init__(self):
+        self.lines = []
+        self.closed = False
+    
+    def info(self, line):
+        self.lines.append(line)
+    
+    def close(self):
+        self.closed = True
+
+class FakeSocketModule:
+    """Stands in for the socket module; every socket it creates is kept in order"""
+    AF_INET = socket.AF_INET
+    SOCK_STREAM = socket.SOCK_STREAM
+    SOL_SOCKET = socket.SOL_SOCKET
+    SO_REUSEADDR = socket.SO_REUSEADDR
+    SO_RCVBUF = socket.SO_RCVBUF
+    SO_SNDBUF = socket.SO_SNDBUF
+    IPPROTO_TCP = socket.IPPROTO_TCP
+    TCP_NODELAY = socket.TCP_NODELAY
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.sockets = []
+        self.connect_error = None
+    
+    def socket(self, family=AF_INET, type=SOCK_STREAM):
+        sock = FakeSocket(self.connect_error)
+        self.sockets.append(sock)
+        return sock
+
+class FakeThread:
+    """A thread that is never actually started"""
+    __slots__ = ('target', 'daemon', 'started')
+    
+    def __init__(self, target=None, daemon=None):
+        self.target = target
+        self.daemon = daemon
+        self.started = False
+    
+    def start(self):
+        self.started = True
+
+class FakeEvent:
+    """A threading.Event for code that never actually waits across threads"""
+    __slots__ = ('flag',)
+    
+    def __init__(self):
+        self.flag = False
+    
+    def set(self):
+        self.flag = True
+    
+    def clear(self):
+        self.flag = False
+    
+    def is_set(self):
+        return self.flag
+    
+    def wait(self, timeout=None):
+        return self.flag
+
+class FakeThreadingModule:
+    """Stands in for the threading module, keeping every thread created"""
+    Event = FakeEvent
+
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.threads = []
+    
+    def Thread(self, target=None, daemon=None):
+        thread = FakeThread(target, daemon)
+        self.threads.append(thread)
+        return thread
+
+class FakeTimeModule:
+    """A clock that stands still unless told otherwise; sleeps are recorded, not slept"""
+    NOW = 1234567890.0
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.monotonic_values = None
+        self.sleeps = []
+        self.on_sleep = None
+    
+    def time(self):
+        return self.NOW
+    
+    def monotonic(self):
+        return self.monotonic_values.pop(0) if self.monotonic_values else 0.0
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if self.on_sleep is not None:
+            self.on_sleep()
+
+class FakeRandomModule:
+    """Returns preset draws and records how it was asked for them"""
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.draw = 0
+        self.randint_value = 0
+        self.choices_calls = []
+    
+    def choices(self, population, cum_weights=None):
+        self.choices_calls.append((population, cum_weights))
+        return [self.draw]
+    
+    def randint(self, a, b):
+        return self.randint_value
+
+class FakeModulesTestCase(unittest.TestCase):
+    """
+    Swaps the modules logical_clock uses for the fakes above, once per class.
+    
+    Installing plain fakes by attribute assignment is much cheaper than
+    entering a patch() per module for every test; setUp only resets them.
+    Anything the code under test prints goes to a class-wide StringIO.
+    """
+    FAKED_MODULES = ('socket', 'threading', 'time', 'random')
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake_socket = FakeSocketModule()
+        cls.fake_threading = FakeThreadingModule()
+        cls.fake_time = FakeTimeModule()
+        cls.fake_random = FakeRandomModule()
+        cls._original_modules = {name: getattr(logical_clock, name) for name in cls.FAKED_MODULES}
+        for name in cls.FAKED_MODULES:
+            setattr(logical_clock, name, getattr(cls, f"fake_{name}"))
+        cls._real_stdout = sys.stdout
+        sys.stdout = cls.stdout_sink = io.StringIO()
+    
+    @classmethod
+    def tearDownClass(cls):
+        sys.stdout = cls._real_stdout
+        for name, module in cls._original_modules.items():
+            setattr(logical_clock, name, module)
+        super().tearDownClass()
+    
     def setUp(self):
-        # Create a mock logger
-        self.mock_logger = MagicMock()
-        
-        # Patch the socket and threading modules
-        self.socket_patcher = patch('logical_clock.socket')
-        self.threading_patcher = patch('logical_clock.threading')
-        self.time_patcher = patch('logical_clock.time')
-        self.random_patcher = patch('logical_clock.random')
-        self.datetime_patcher = patch('logical_clock.datetime')
-        
-        self.mock_socket = self.socket_patcher.start()
-        self.mock_threading = self.threading_patcher.start()
-        self.mock_time = self.time_patcher.start()
-        self.mock_random = self.random_patcher.start()
-        self.mock_datetime = self.datetime_patcher.start()
-        
-        # Set up mock socket server
-        self.mock_server_socket = MagicMock()
-        self.mock_socket.socket.return_value = self.mock_server_socket
-        
-        # Mock datetime.now().timestamp()
-        self.mock_datetime.now.return_value.timestamp.return_value = 1234567890.0
-        
-        # Create a virtual machine for testing
-        with patch('logical_clock.logging'):
-            with patch('logical_clock.os.makedirs'):
-                self.vm = VirtualMachine(0, 1, 8000, [8001, 8002])
-                self.vm.logger = self.mock_logger
-                self.vm.peers = [MagicMock(), MagicMock()]
+        for name in self.FAKED_MODULES:
+            getattr(self, f"fake_{name}").reset()
+        self.stdout_sink.seek(0)
+        self.stdout_sink.truncate()
+
+class TestVirtualMachine(FakeModulesTestCase):
+    # Every event is stamped with the fake clock's fixed time, so the
+    # expected log lines can be built once here
+    TS = FakeTimeModule.NOW
+    START_LINE = f"START,{TS},0,0,clock_rate=1;internal_prob=0.7"
+    INTERNAL_LINE = f"INTERNAL,{TS},0,1"
+    RECEIVE_ONE_LINE = f"RECEIVE,{TS},0,6"
+    RECEIVE_FIRST_OF_MANY_LINE = f"RECEIVE,{TS},2,5"
+    SEND_ALL_LINE = f"SEND,{TS},0,1,all peers"
+    SEND_ONE_LINE = f"SEND,{TS},0,1,peer(s) [0]"
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        
+        # Create one virtual machine for all tests, and remember its freshly
+        # constructed state so setUp can restore it instead of rebuilding it
+        with patch('logical_clock.os.makedirs'):
+            cls.template_vm = VirtualMachine(0, 1, 8000, [8001, 8002])
+        cls.server_socket = cls.fake_socket.sockets[0]
+        cls.template_state = dict(cls.template_vm.__dict__)
     
-    def tearDown(self):
-        self.socket_patcher.stop()
-        self.threading_patcher.stop()
-        self.time_patcher.stop()
-        self.random_patcher.stop()
-        self.datetime_patcher.stop()
+    def setUp(self):
+        super().setUp()
+        
+        # Reset the shared VM; this also drops any methods a test replaced
+        self.vm = self.template_vm
+        self.vm.__dict__.clear()
+        self.vm.__dict__.update(self.template_state)
+        self.vm.message_queue = collections.deque()
+        self.vm.connected_event = FakeEvent()
+        self.vm.message_arrived = FakeEvent()
+        self.server_socket.close_count = 0
+        
+        # Create a fake logger and peers
+        self.fake_logger = FakeLogger()
+        self.vm.logger = self.fake_logger
+        self.vm.peers = [FakePeer(), FakePeer()]
+    
+    def _run_ticks(self, draw=0, randint_value=0, has_message=False, ticks=1):
+        """
+        Run the VM's main loop for a number of ticks with its peers and inbox mocked out.
+        
+        Args:
+            draw (int): Value random.choices returns on every tick
+            randint_value (int): Value random.randint returns (the target peer)
+            has_message (bool): Whether process_message reports a message on every tick
+            ticks (int): Stop the loop after it has slept this many times
+        """
+        self.vm.process_message = MagicMock(return_value=has_message)
+        self.vm.connect_to_peers = MagicMock()
+        self.fake_random.draw = draw
+        self.fake_random.randint_value = randint_value
+        
+        def on_sleep():
+            if len(self.fake_time.sleeps) >= ticks:
+                self.vm.running = False
+        self.fake_time.on_sleep = on_sleep
+        
+        self.vm.run()
     
     def test_initialization(self):
         """Test that the virtual machine initializes correctly"""
@@ -58,24 +296,24 @@ class TestVirtualMachine(unittest.TestCase):
         self.assertEqual(self.vm.port, 8000)
         self.assertEqual(self.vm.peer_ports, [8001, 8002])
         self.assertEqual(self.vm.logical_clock, 0)
-        self.assertIsInstance(self.vm.message_queue, queue.Queue)
+        self.assertIsInstance(self.vm.message_queue, collections.deque)
         self.assertFalse(self.vm.running)
         
         # Test socket initialization
-        self.mock_server_socket.bind.assert_called_once_with(('localhost', 8000))
-        self.mock_server_socket.listen.assert_called_once_with(5)
+        self.assertEqual(self.server_socket.address, ('localhost', 8000))
+        self.assertEqual(self.server_socket.backlog, 5)
     
     def test_process_internal_event(self):
         """Test that internal events increment the logical clock"""
         initial_clock = self.vm.logical_clock
         self.vm.process_internal_event()
         self.assertEqual(self.vm.logical_clock, initial_clock + 1)
-        self.mock_logger.info.assert_called_once_with(f"INTERNAL,{self.mock_datetime.now.return_value.timestamp.return_value},{self.vm.message_queue.qsize()},{self.vm.logical_clock}")
+        self.assertEqual(self.fake_logger.lines, [self.INTERNAL_LINE])
     
     def test_process_message(self):
         """Test that processing a message updates the logical clock correctly"""
         # Add a message to the queue
-        self.vm.message_queue.put(5)
+        self.vm.message_queue.append(5)
         self.vm.logical_clock = 3
         
         # Process the message
@@ -84,7 +322,28 @@ class TestVirtualMachine(unittest.TestCase):
         # Check that the logical clock was updated correctly
         self.assertTrue(result)
         self.assertEqual(self.vm.logical_clock, 6)  # max(3, 5) + 1
-        self.mock_logger.info.assert_called_once_with(f"RECEIVE,{self.mock_datetime.now.return_value.timestamp.return_value},{self.vm.message_queue.qsize()},{self.vm.logical_clock}")
+        self.assertEqual(self.fake_logger.lines, [self.RECEIVE_ONE_LINE])
+    
+    def test_process_message_one_per_tick(self):
+        """Test that only the oldest message is processed and the rest stay queued"""
+        for received_time in (4, 9, 2):
+            self.vm.message_queue.append(received_time)
+        self.vm.message_arrived.set()
+        self.vm.logical_clock = 3
+        
+        result = self.vm.process_message()
+        
+        self.assertTrue(result)
+        self.assertEqual(self.vm.logical_clock, 5)  # max(3, 4) + 1
+        self.assertEqual(list(self.vm.message_queue), [9, 2])
+        self.assertTrue(self.vm.message_arrived.is_set())
+        self.assertEqual(self.fake_logger.lines, [self.RECEIVE_FIRST_OF_MANY_LINE])
+        
+        # Working through the rest one tick at a time lands on max(5, 9) + 1, then max(10, 2) + 1
+        self.vm.process_message()
+        self.vm.process_message()
+        self.assertEqual(self.vm.logical_clock, 11)
+        self.assertFalse(self.vm.message_arrived.is_set())
     
     def test_process_message_empty_queue(self):
         """Test that processing an empty queue returns False"""
@@ -92,7 +351,7 @@ class TestVirtualMachine(unittest.TestCase):
         result = self.vm.process_message()
         self.assertFalse(result)
         self.assertEqual(self.vm.logical_clock, initial_clock)
-        self.mock_logger.info.assert_not_called()
+        self.assertEqual(self.fake_logger.lines, [])
     
     def test_send_message(self):
         """Test that sending a message increments the logical clock"""
@@ -102,9 +361,9 @@ class TestVirtualMachine(unittest.TestCase):
         
         # Check that the message was sent to all peers
         for peer in self.vm.peers:
-            peer.sendall.assert_called_once_with(str(self.vm.logical_clock).encode())
+            self.assertEqual(peer.sendall_args, struct.pack('<I', self.vm.logical_clock))
         
-        self.mock_logger.info.assert_called_once_with(f"SEND,{self.mock_datetime.now.return_value.timestamp.return_value},{self.vm.message_queue.qsize()},{self.vm.logical_clock},all peers")
+        self.assertEqual(self.fake_logger.lines, [self.SEND_ALL_LINE])
     
     def test_send_message_to_specific_peer(self):
         """Test that sending a message to a specific peer works"""
@@ -113,25 +372,23 @@ class TestVirtualMachine(unittest.TestCase):
         self.assertEqual(self.vm.logical_clock, initial_clock + 1)
         
         # Check that the message was sent to the first peer only
-        self.vm.peers[0].sendall.assert_called_once_with(str(self.vm.logical_clock).encode())
-        self.vm.peers[1].sendall.assert_not_called()
+        self.assertEqual(self.vm.peers[0].sendall_args, struct.pack('<I', self.vm.logical_clock))
+        self.assertIsNone(self.vm.peers[1].sendall_args)
         
-        self.mock_logger.info.assert_called_once_with(f"SEND,{self.mock_datetime.now.return_value.timestamp.return_value},{self.vm.message_queue.qsize()},{self.vm.logical_clock},peer(s) [0]")
+        self.assertEqual(self.fake_logger.lines, [self.SEND_ONE_LINE])
     
     def test_send_message_error_handling(self):
         """Test error handling when sending a message fails"""
         # Make the first peer raise an exception when sendall is called
-        self.vm.peers[0].sendall.side_effect = Exception("Connection error")
+        self.vm.peers[0].send_error = Exception("Connection error")
         
-        # Redirect stdout to capture print statements
-        with patch('sys.stdout'):
-            self.vm.send_message([0])
+        self.vm.send_message([0])
         
         # The logical clock should still be incremented
         self.assertEqual(self.vm.logical_clock, 1)
         
         # The logger should still record the send event
-        self.mock_logger.info.assert_called_once()
+        self.assertEqual(len(self.fake_logger.lines), 1)
     
     def test_internal_event_probability(self):
         """Test that the internal event probability is set correctly"""
@@ -140,54 +397,95 @@ class TestVirtualMachine(unittest.TestCase):
         
         # Test with environment variable
         with patch.dict('os.environ', {'INTERNAL_EVENT_PROB': '0.5'}):
-            with patch('logical_clock.logging'):
-                with patch('logical_clock.os.makedirs'):
-                    vm = VirtualMachine(0, 1, 8000, [8001, 8002])
-                    self.assertAlmostEqual(vm.internal_event_prob, 0.5)
+            with patch('logical_clock.os.makedirs'):
+                vm = VirtualMachine(0, 1, 8000, [8001, 8002])
+                self.assertAlmostEqual(vm.internal_event_prob, 0.5)
         
         # Test with invalid environment variable
         with patch.dict('os.environ', {'INTERNAL_EVENT_PROB': 'invalid'}):
-            with patch('logical_clock.logging'):
-                with patch('logical_clock.os.makedirs'):
-                    vm = VirtualMachine(0, 1, 8000, [8001, 8002])
-                    self.assertAlmostEqual(vm.internal_event_prob, 0.7)  # Should use default
+            with patch('logical_clock.os.makedirs'):
+                vm = VirtualMachine(0, 1, 8000, [8001, 8002])
+                self.assertAlmostEqual(vm.internal_event_prob, 0.7)  # Should use default
     
     def test_connect_to_peers_success(self):
         """Test successful connection to peers"""
-        # Mock successful connection
-        mock_peer_socket = MagicMock()
-        self.mock_socket.socket.return_value = mock_peer_socket
-        
-        # Redirect stdout to capture print statements
-        with patch('sys.stdout'):
-            self.vm.connect_to_peers()
+        self.vm.connect_to_peers()
         
         # Check that connections were attempted for both peer ports
-        self.assertEqual(self.mock_socket.socket.call_count, 3) # 2 + initial connect
-        mock_peer_socket.connect.assert_has_calls([
-            call(('localhost', 8001)),
-            call(('localhost', 8002))
-        ])
+        self.assertEqual(len(self.fake_socket.sockets), 2)
+        peer_sockets = self.fake_socket.sockets
+        self.assertEqual([sock.connected for sock in peer_sockets],
+                         [[('localhost', 8001)], [('localhost', 8002)]])
         
         # Check that peers were added
         self.assertEqual(len(self.vm.peers), 4)  # 2 from setUp + 2 new ones
+        
+        # Small clock messages must not wait for Nagle's algorithm
+        for sock in peer_sockets:
+            self.assertIn((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), sock.sockopts)
+    
+    def test_connected_event_ignores_closed_probes(self):
+        """Test that a connection that hangs up does not count towards connected_event"""
+        self.vm.selector = MagicMock()
+        self.vm.server_socket = MagicMock()
+        self.vm.server_socket.accept.side_effect = lambda: (MagicMock(), ('127.0.0.1', 0))
+        
+        # A port probe connects and immediately hangs up
+        self.vm._accept_connection()
+        probe = self.vm.selector.register.call_args.args[2]
+        self.vm._close_connection(probe)
+        
+        self.vm._accept_connection()
+        self.assertFalse(self.vm.connected_event.is_set())
+        self.vm._accept_connection()
+        self.assertTrue(self.vm.connected_event.is_set())
+        
+        # Losing a peer clears the event again
+        self.vm._close_connection(self.vm.selector.register.call_args.args[2])
+        self.assertFalse(self.vm.connected_event.is_set())
+    
+    def test_tune_socket_without_tcp(self):
+        """Test that the buffer size is still set when TCP_NODELAY is rejected"""
+        options = []
+        def setsockopt(level, option, value):
+            if level == socket.IPPROTO_TCP:
+                raise OSError("Operation not supported")
+            options.append((level, option, value))
+        sock = MagicMock()
+        sock.setsockopt.side_effect = setsockopt
+        
+        logical_clock._tune_socket(sock, socket.SO_SNDBUF, 4096)
+        
+        self.assertEqual(options, [(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)])
+    
+    def test_connect_to_unix_peers(self):
+        """Test that AF_UNIX peers are connected by path rather than (host, port)"""
+        self.vm.family = getattr(socket, 'AF_UNIX', None)
+        self.vm.peer_ports = ['/tmp/vm_1.sock', '/tmp/vm_2.sock']
+        self.vm.connect_to_peers()
+        
+        self.assertEqual([sock.connected for sock in self.fake_socket.sockets],
+                         [['/tmp/vm_1.sock'], ['/tmp/vm_2.sock']])
     
     def test_connect_to_peers_failure(self):
         """Test handling of connection failures to peers"""
-        # Mock connection failure
-        mock_peer_socket = MagicMock()
-        self.mock_socket.socket.return_value = mock_peer_socket
-        mock_peer_socket.connect.side_effect = ConnectionRefusedError("Connection refused")
+        # Refuse every connection
+        self.fake_socket.connect_error = ConnectionRefusedError("Connection refused")
+        self.vm.connect_retry_interval = 0.01
         
-        # Redirect stdout to capture print statements
-        with patch('sys.stdout'):
+        with patch('logical_clock.CONNECT_RETRIES', 2):
             self.vm.connect_to_peers()
         # Check that connections were attempted for both peer ports
-        self.assertEqual(self.mock_socket.socket.call_count, 20 + 1)  # 2 peers * 10 retries + initial connection
+        self.assertEqual(len(self.fake_socket.sockets), 4)  # 2 peers * 2 retries
+        self.assertEqual(self.fake_time.sleeps, [0.01] * 4)
         
         # Check that no new peers were added
         self.assertEqual(len(self.vm.peers), 2)  # Only the 2 from setUp
     
+    def test_connect_retries_default(self):
+        """Test that each peer gets ten connection attempts by default"""
+        self.assertEqual(logical_clock.CONNECT_RETRIES, 10)
+    
     def test_handle_client(self):
         """Test handling messages from a client"""
         # Set up the VM to run
@@ -195,21 +493,42 @@ class TestVirtualMachine(unittest.TestCase):
         
         # Mock client socket
         client_socket = MagicMock()
-        client_socket.recv.side_effect = [
-            "42".encode(),  # First message
+        client_socket.recv_into.side_effect = recv_into_from([
+            struct.pack('<I', 42),  # First message
             "".encode(),    # Empty message to break the loop
-        ]
+        ])
         
-        # Handle the client
-        self.vm.handle_client(client_socket)
+        # Handle the client until it disconnects
+        connection = PeerConnection(client_socket)
+        self.assertTrue(self.vm.handle_client(connection))
+        self.assertFalse(self.vm.handle_client(connection))
         
         # Check that the message was added to the queue
-        self.assertEqual(self.vm.message_queue.qsize(), 1)
-        self.assertEqual(self.vm.message_queue.get(), 42)
+        self.assertEqual(len(self.vm.message_queue), 1)
+        self.assertEqual(self.vm.message_queue.popleft(), 42)
+        self.assertTrue(self.vm.message_arrived.is_set())
         
         # Check that the socket was closed
         client_socket.close.assert_called_once()
     
+    def test_handle_client_framing(self):
+        """Test that messages split across or coalesced within recv calls are framed correctly"""
+        self.vm.running = True
+        
+        client_socket = MagicMock()
+        client_socket.recv_into.side_effect = recv_into_from([
+            struct.pack('<II', 1, 23)[:6],  # One full message and the start of another
+            struct.pack('<II', 1, 23)[6:] + struct.pack('<I', 45),  # The rest of it and a third message
+            b"",
+        ])
+        
+        connection = PeerConnection(client_socket)
+        while self.vm.handle_client(connection):
+            pass
+        
+        received = list(self.vm.message_queue)
+        self.assertEqual(received, [1, 23, 45])
+    
     def test_handle_client_error(self):
         """Test error handling in handle_client"""
         # Set up the VM to run
@@ -217,59 +536,55 @@ class TestVirtualMachine(unittest.TestCase):
         
         # Mock client socket with an error
         client_socket = MagicMock()
-        client_socket.recv.side_effect = Exception("Test exception")
+        client_socket.recv_into.side_effect = Exception("Test exception")
         
-        # Redirect stdout to capture print statements
-        with patch('sys.stdout'):
-            self.vm.handle_client(client_socket)
+        self.assertFalse(self.vm.handle_client(PeerConnection(client_socket)))
         
         # Check that the socket was closed
         client_socket.close.assert_called_once()
     
     def test_run(self):
         """Test the main run loop of the VM"""
-        # Mock process_message to return False (no message processed)
-        self.vm.process_message = MagicMock(return_value=False)
-        
-        # Mock connect_to_peers
-        self.vm.connect_to_peers = MagicMock()
-        
-        # Set random values for different events
-        self.mock_random.random.return_value = 0.5  # Internal event (< 0.7)
-        self.mock_random.randint.return_value = 1  # For communication event type
-        
-        # Make the VM stop after one iteration
-        def stop_vm(*args, **kwargs):
-            self.vm.running = False
-            return None
-        self.mock_time.sleep.side_effect = stop_vm
-        
-        # Run the VM
-        self.vm.run()
+        # Run one tick with no message and an internal event
+        self._run_ticks(draw=0)
         
         # Check that the VM was set to running
         self.assertFalse(self.vm.running)  # Should be False after stopping
         
         # Check that a thread was started to accept connections
-        self.mock_threading.Thread.assert_called_once_with(
-            target=self.vm.accept_connections,
-            daemon=True
-        )
-        self.mock_threading.Thread.return_value.start.assert_called_once()
+        self.assertEqual(len(self.fake_threading.threads), 1)
+        accept_thread = self.fake_threading.threads[0]
+        self.assertEqual(accept_thread.target, self.vm.accept_connections)
+        self.assertTrue(accept_thread.daemon)
+        self.assertTrue(accept_thread.started)
         
         # Check that connect_to_peers was called
         self.vm.connect_to_peers.assert_called_once()
         
-        # Check that the logger recorded the start event
-        self.mock_logger.info.assert_has_calls(
-            [call(f"START,{self.mock_datetime.now.return_value.timestamp.return_value},0,0,clock_rate=1;internal_prob=0.7")]
-        )
+        # Check that the logger recorded the start event and the internal event
+        self.assertEqual(self.fake_logger.lines, [self.START_LINE, self.INTERNAL_LINE])
         
         # Check that process_message was called
         self.vm.process_message.assert_called_once()
         
         # Check that time.sleep was called with the correct value
-        self.mock_time.sleep.assert_called_once_with(1.0)  # 1.0 / clock_rate = 1.0
+        self.assertEqual(self.fake_time.sleeps, [1.0])  # 1.0 / clock_rate = 1.0
+    
+    def test_run_tick_deadlines(self):
+        """Test that ticks are scheduled on absolute deadlines instead of fixed sleeps"""
+        # Start at 0, finish the first tick at 0.25, overrun the second
+        # tick's deadline (2.0) and finish the third tick at 3.6
+        self.fake_time.monotonic_values = [0.0, 0.25, 3.5, 3.6]
+        
+        # Stop on the second sleep
+        self._run_ticks(has_message=True, ticks=2)
+        
+        # The first sleep only covers what is left of the tick, and the
+        # overrun tick is not made up for with a burst of catch-up ticks
+        self.assertEqual(self.vm.process_message.call_count, 3)
+        self.assertEqual(len(self.fake_time.sleeps), 2)
+        self.assertAlmostEqual(self.fake_time.sleeps[0], 0.75)
+        self.assertAlmostEqual(self.fake_time.sleeps[1], 0.9)
     
     def test_run_with_keyboard_interrupt(self):
         """Test handling of KeyboardInterrupt in the run loop"""
@@ -279,147 +594,106 @@ class TestVirtualMachine(unittest.TestCase):
         # Mock connect_to_peers
         self.vm.connect_to_peers = MagicMock()
         
-        # Redirect stdout to capture print statements
-        with patch('sys.stdout'):
-            self.vm.run()
+        self.vm.run()
         
         # Check that the VM was stopped
         self.assertFalse(self.vm.running)
         
         # Check that the server socket was closed
-        self.mock_server_socket.close.assert_called_once()
-    
-    def test_run_internal_event(self):
-        """Test the run loop with an internal event"""
-        # Mock process_message to return False (no message processed)
-        self.vm.process_message = MagicMock(return_value=False)
-        self.vm.process_internal_event = MagicMock()
-        
-        # Mock connect_to_peers
-        self.vm.connect_to_peers = MagicMock()
-        
-        # Set random value for internal event
-        self.mock_random.random.return_value = 0.5  # < 0.7, so internal event
+        self.assertEqual(self.server_socket.close_count, 1)
         
-        # Make the VM stop after one iteration
-        def stop_vm(*args, **kwargs):
-            self.vm.running = False
-            return None
-        self.mock_time.sleep.side_effect = stop_vm
+        # Check that the peer connections were closed
+        self.assertTrue(all(peer.closed for peer in self.vm.peers))
         
-        # Run the VM
-        with patch('sys.stdout'):
-            self.vm.run()
-        
-        # Check that process_internal_event was called
-        self.vm.process_internal_event.assert_called_once()
+        # Check that buffered log events were flushed
+        self.assertTrue(self.fake_logger.closed)
     
-    def test_run_communication_event_type1(self):
-        """Test the run loop with a communication event type 1"""
-        # Mock process_message to return False (no message processed)
-        self.vm.process_message = MagicMock(return_value=False)
-        self.vm.send_message = MagicMock()
-        
-        # Mock connect_to_peers
-        self.vm.connect_to_peers = MagicMock()
-        
-        # Set random values for communication event
-        self.mock_random.random.return_value = 0.8  # > 0.7, so communication event
-        self.mock_random.randint.side_effect = [1, 0]  # Type 1, target peer 0
-        
-        # Make the VM stop after one iteration
-        def stop_vm(*args, **kwargs):
-            self.vm.running = False
-            return None
-        self.mock_time.sleep.side_effect = stop_vm
-        
-        # Run the VM
-        with patch('sys.stdout'):
+    def test_run_unlinks_unix_socket(self):
+        """Test that an AF_UNIX VM removes its socket path on shutdown"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "vm_0.sock")
+            open(path, "w").close()
+            self.vm.family = getattr(socket, 'AF_UNIX', None)
+            self.vm.port = path
+            self.vm.process_message = MagicMock(side_effect=KeyboardInterrupt)
+            self.vm.connect_to_peers = MagicMock()
+            
             self.vm.run()
-        
-        # Check that send_message was called with the correct target
-        self.vm.send_message.assert_called_once_with([0])
+            
+            self.assertFalse(os.path.exists(path))
     
-    def test_run_communication_event_type2(self):
-        """Test the run loop with a communication event type 2"""
-        # Mock process_message to return False (no message processed)
-        self.vm.process_message = MagicMock(return_value=False)
-        self.vm.send_message = MagicMock()
-        
-        # Mock connect_to_peers
-        self.vm.connect_to_peers = MagicMock()
-        
-        # Set random values for communication event
-        self.mock_random.random.return_value = 0.8  # > 0.7, so communication event
-        self.mock_random.randint.side_effect = [2, 1]  # Type 2, target peer 1
-        
-        # Make the VM stop after one iteration
-        def stop_vm(*args, **kwargs):
-            self.vm.running = False
-            return None
-        self.mock_time.sleep.side_effect = stop_vm
-        
-        # Run the VM
-        with patch('sys.stdout'):
-            self.vm.run()
-        
-        # Check that send_message was called with the correct target
-        self.vm.send_message.assert_called_once_with([1])
+    # (random draw, randint value, number of peers, expected method, expected args)
+    RUN_DISPATCH_CASES = [
+        (0, 0, 2, 'process_internal_event', ()),
+        (1, 0, 2, 'send_message', ([0],)),
+        (2, 1, 2, 'send_message', ([1],)),
+        (3, 0, 2, 'send_message', ()),
+        (1, 0, 0, 'process_internal_event', ()),  # No peers, so fall back to an internal event
+    ]
     
-    def test_run_communication_event_type3(self):
-        """Test the run loop with a communication event type 3"""
-        # Mock process_message to return False (no message processed)
-        self.vm.process_message = MagicMock(return_value=False)
-        self.vm.send_message = MagicMock()
-        
-        # Mock connect_to_peers
-        self.vm.connect_to_peers = MagicMock()
-        
-        # Set random values for communication event
-        self.mock_random.random.return_value = 0.8  # > 0.7, so communication event
-        self.mock_random.randint.return_value = 3  # Type 3
-        
-        # Make the VM stop after one iteration
-        def stop_vm(*args, **kwargs):
-            self.vm.running = False
-            return None
-        self.mock_time.sleep.side_effect = stop_vm
-        
-        # Run the VM
-        with patch('sys.stdout'):
-            self.vm.run()
-        
-        # Check that send_message was called with no targets (all peers)
-        self.vm.send_message.assert_called_once_with()
+    def test_run_dispatch_table(self):
+        """Test that each random draw in the run loop triggers the right event"""
+        for draw, randint_value, n_peers, method, args in self.RUN_DISPATCH_CASES:
+            with self.subTest(draw=draw, n_peers=n_peers):
+                self.setUp()
+                self.vm.peers = self.vm.peers[:n_peers]
+                for name in ('send_message', 'process_internal_event'):
+                    setattr(self.vm, name, MagicMock())
+                
+                self._run_ticks(draw=draw, randint_value=randint_value)
+                
+                getattr(self.vm, method).assert_called_once_with(*args)
+                other = 'process_internal_event' if method == 'send_message' else 'send_message'
+                getattr(self.vm, other).assert_not_called()
+
+
+class TestClockHelpers(FakeModulesTestCase):
+    def test_clock_update(self):
+        """Test Lamport's receive rule"""
+        self.assertEqual(_clock_update(3, 5), 6)
+        self.assertEqual(_clock_update(7, 2), 8)
     
-    def test_run_communication_event_fallback(self):
-        """Test the run loop with a communication event that falls back to internal event"""
-        # Mock process_message to return False (no message processed)
-        self.vm.process_message = MagicMock(return_value=False)
-        self.vm.process_internal_event = MagicMock()
-        
-        # Remove all peers to force fallback
-        self.vm.peers = []
-        
-        # Mock connect_to_peers
-        self.vm.connect_to_peers = MagicMock()
-        
-        # Set random values for communication event
-        self.mock_random.random.return_value = 0.8  # > 0.7, so communication event
-        self.mock_random.randint.return_value = 1  # Type 1
-        
-        # Make the VM stop after one iteration
-        def stop_vm(*args, **kwargs):
-            self.vm.running = False
-            return None
-        self.mock_time.sleep.side_effect = stop_vm
-        
-        # Run the VM
-        with patch('sys.stdout'):
-            self.vm.run()
-        
-        # Check that process_internal_event was called (fallback)
-        self.vm.process_internal_event.assert_called_once()
+    def test_event_cum_weights(self):
+        """Test that the communication probability is split evenly across the three types"""
+        for expected, actual in zip((0.7, 0.8, 0.9, 1.0), _event_cum_weights(0.7)):
+            self.assertAlmostEqual(expected, actual)
+        self.assertEqual(_event_cum_weights(1.5), (1.0, 1.0, 1.0, 1.0))
+    
+    def test_pick_event(self):
+        """Test that random draws map to the expected events"""
+        cum_weights = _event_cum_weights(0.7)
+        self.fake_random.draw = 0
+        self.assertEqual(_pick_event(cum_weights, 2), (EVENT_INTERNAL, -1))
+        self.assertEqual(self.fake_random.choices_calls[-1], ((0, 1, 2, 3), cum_weights))
+        
+        self.fake_random.draw = 2
+        self.fake_random.randint_value = 1
+        self.assertEqual(_pick_event(cum_weights, 2), (EVENT_SEND_ONE, 1))
+        
+        self.fake_random.draw = 3
+        self.assertEqual(_pick_event(cum_weights, 2), (EVENT_SEND_ALL, -1))
+        
+        self.fake_random.draw = 2
+        self.assertEqual(_pick_event(cum_weights, 1), (EVENT_INTERNAL, -1))
+
+
+class TestEventLog(unittest.TestCase):
+    def test_event_log(self):
+        """Test that events are buffered to the log file and flushed on close"""
+        with tempfile.TemporaryDirectory() as log_dir:
+            log_file = os.path.join(log_dir, "machine_0.log")
+            event_log = EventLog(log_file)
+            
+            # The file is only created once there is something to write
+            self.assertFalse(os.path.exists(log_file))
+            
+            event_log.info("START,1234567890.0,0,0,clock_rate=1;internal_prob=0.7")
+            event_log.info("INTERNAL,1234567890.1,0,1")
+            event_log.close()
+            
+            with open(log_file) as f:
+                self.assertEqual(f.read(), "START,1234567890.0,0,0,clock_rate=1;internal_prob=0.7\n"
+                                           "INTERNAL,1234567890.1,0,1\n")
 
 
 class TestStartMachine(unittest.TestCase):
@@ -440,5 +714,40 @@ class TestStartMachine(unittest.TestCase):
             mock_vm.run.assert_called_once()
 
 
+
+class TestMainFunction(unittest.TestCase):
+    # (main() args, environment, randint result, expected randint range, expected start_machine args)
+    MAIN_CASES = [
+        ((0, 8000, 3), {}, 5, (1, 6), (0, 5, 8000, [8001, 8002])),
+        ((1, 8000, 3), {'CLOCK_RATE_VARIATION': 'normal'}, 2, (1, 6), (1, 2, 8001, [8000, 8002])),
+        ((2, 9000, 4), {'CLOCK_RATE_VARIATION': 'small'}, 3, (3, 4), (2, 3, 9002, [9000, 9001, 9003])),
+    ]
+    
+    def test_main(self):
+        """Test that main derives ports and a clock rate and starts the machine"""
+        # One patched scope for every case; main must not install real
+        # signal handlers or pin the test process
+        with patch('logical_clock.start_machine') as mock_start, \
+                patch('logical_clock.random.randint') as mock_randint, \
+                patch('logical_clock.signal'), \
+                patch('logical_clock._pin_process') as mock_pin, \
+                patch('sys.stdout'):
+            for args, env, rate, rate_range, expected in self.MAIN_CASES:
+                with self.subTest(args=args, env=env):
+                    mock_start.reset_mock()
+                    mock_pin.reset_mock()
+                    mock_randint.reset_mock()
+                    mock_randint.return_value = rate
+                    
+                    with patch.dict('os.environ', env):
+                        if 'CLOCK_RATE_VARIATION' not in env:
+                            os.environ.pop('CLOCK_RATE_VARIATION', None)
+                        logical_clock.main(*args)
+                    
+                    mock_randint.assert_called_once_with(*rate_range)
+                    mock_pin.assert_called_once_with(args[0])
+                    mock_start.assert_called_once_with(*expected)
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
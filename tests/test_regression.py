@@ -1,49 +1,72 @@
 import unittest
 import sys
 import os
-import time
 import threading
 import socket
-import queue
-import logging
-import random
-from unittest.mock import patch, MagicMock, call
+import tempfile
+import numpy as np
+from unittest.mock import patch
 
 # Add parent directory to path to import logical_clock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logical_clock import VirtualMachine
 
+class _NoopLogger:
+    """An EventLog that discards every event; these tests never inspect the log"""
+    info = close = staticmethod(lambda *args, **kwargs: None)
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix domain sockets are not available")
 class TestVirtualMachineRegression(unittest.TestCase):
-    def setUp(self):
-        # Patch logging to prevent actual file writes
-        self.logging_patcher = patch('logical_clock.logging')
-        self.mock_logging = self.logging_patcher.start()
-        
-        # Patch os.makedirs to prevent directory creation
-        self.makedirs_patcher = patch('logical_clock.os.makedirs')
-        self.mock_makedirs = self.makedirs_patcher.start()
-        
-        # Create mock loggers
-        self.mock_loggers = [MagicMock() for _ in range(3)]
+    @classmethod
+    def setUpClass(cls):
+        # Build, start and connect the VMs once for all tests; each test
+        # only resets their clocks and queues
+        cls.makedirs_patcher = patch('logical_clock.os.makedirs')
+        cls.mock_makedirs = cls.makedirs_patcher.start()
         
         # Create virtual machines for testing
-        self.vms = []
-        self.ports = [8000, 8001, 8002]
-        
-        # Create VMs with real sockets but mock loggers
+        cls.vms = []
+        # Talk over Unix domain sockets to skip the loopback TCP stack; the
+        # paths carry the process ID so parallel test processes
+        # (e.g. pytest -n auto) do not collide
+        cls.ports = [os.path.join(tempfile.gettempdir(), f'vm_{i}_{os.getpid()}.sock')
+                     for i in range(3)]
+        cls._unlink_ports()
+        
+        # Create VMs with real sockets but no-op loggers
         for i in range(3):
             vm = VirtualMachine(
                 machine_id=i,
                 clock_rate=1,
-                port=self.ports[i],
-                peer_ports=[p for p in self.ports if p != self.ports[i]]
+                port=cls.ports[i],
+                peer_ports=[p for p in cls.ports if p != cls.ports[i]],
+                family=socket.AF_UNIX
             )
-            vm.logger = self.mock_loggers[i]
-            self.vms.append(vm)
+            vm.logger = _NoopLogger()
+            # Retry refused connections quickly instead of once a second
+            vm.connect_retry_interval = 0.01
+            cls.vms.append(vm)
+        
+        # Start server threads for each VM
+        cls.server_threads = []
+        for vm in cls.vms:
+            vm.running = True
+            thread = threading.Thread(target=vm.accept_connections, daemon=True)
+            thread.start()
+            cls.server_threads.append(thread)
+        
+        # Connect VMs to each other; the server sockets are already listening
+        for vm in cls.vms:
+            vm.connect_to_peers()
+        for i, vm in enumerate(cls.vms):
+            if not vm.connected_event.wait(2.0):
+                cls.tearDownClass()
+                raise RuntimeError(f"VM {i} did not accept all peer connections")
     
-    def tearDown(self):
+    @classmethod
+    def tearDownClass(cls):
         # Stop all VMs
-        for vm in self.vms:
+        for vm in cls.vms:
             vm.running = False
             vm.server_socket.close()
             for peer in vm.peers:
@@ -51,92 +74,89 @@ class TestVirtualMachineRegression(unittest.TestCase):
                     peer.close()
                 except:
                     pass
+        for thread in cls.server_threads:
+            thread.join(1.0)
+        
+        cls._unlink_ports()
         
         # Stop patchers
-        self.logging_patcher.stop()
-        self.makedirs_patcher.stop()
+        cls.makedirs_patcher.stop()
+    
+    @classmethod
+    def _unlink_ports(cls):
+        """Remove the Unix socket files, which outlive their sockets"""
+        for path in cls.ports:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    
+    def setUp(self):
+        # Start every test from zeroed clocks and empty queues
+        for vm in self.vms:
+            vm.logical_clock = 0
+            vm.message_queue.clear()
+            vm.message_arrived.clear()
+    
+    def wait_for_message(self, vm_idx, timeout=1.0):
+        """Wait until a message has been queued on the given VM"""
+        self.assertTrue(self.vms[vm_idx].message_arrived.wait(timeout),
+                        f"VM {vm_idx} did not receive a message")
     
     def test_logical_clock_monotonicity(self):
         """Test that logical clocks only increase over time"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
-        
         # Track logical clock values over time
         clock_history = [[] for _ in range(3)]
         
+        # Draw the acting VM, the event kind and the target peer for every step up front
+        rng = np.random.default_rng()
+        vm_choices = rng.integers(0, 3, size=10)
+        internal_draws = rng.random(10)
+        target_choices = rng.integers(0, 2, size=10)
+        
+        # Bind the VMs and their queues to locals for the loop
+        vms = self.vms
+        queues = [vm.message_queue for vm in vms]
+        
         # Run a series of random events
-        for _ in range(10):
+        for step in range(10):
             # Choose a random VM to perform an action
-            vm_idx = random.randint(0, 2)
-            vm = self.vms[vm_idx]
+            vm_idx = int(vm_choices[step])
+            vm = vms[vm_idx]
             
             # Randomly choose between internal event and send message
-            if random.random() < 0.5:
+            if internal_draws[step] < 0.5:
                 # Internal event
                 vm.process_internal_event()
             else:
                 # Send message to random peer
-                target_idx = random.randint(0, 1)  # 0 or 1
+                target_idx = int(target_choices[step])  # 0 or 1
                 vm.send_message([target_idx])
+                
+                # Wait for the message to be received; peers are the other
+                # VMs in ID order
+                self.wait_for_message([i for i in range(3) if i != vm_idx][target_idx])
             
             # Record new clock value
             clock_history[vm_idx].append(vm.logical_clock)
             
-            # Give time for messages to be received
-            time.sleep(0.1)
-            
             # Process any received messages
-            for i, vm in enumerate(self.vms):
-                if not vm.message_queue.empty():
+            for i, vm in enumerate(vms):
+                if queues[i]:
                     vm.process_message()
                     # Record updated clock value
                     clock_history[i].append(vm.logical_clock)
         
         # Check that clock values are monotonically increasing for each VM
         for i, history in enumerate(clock_history):
-            for j in range(1, len(history)):
-                self.assertGreater(history[j], history[j-1], 
-                                  f"VM {i} clock decreased from {history[j-1]} to {history[j]}")
+            # One vectorised pass; index the first offending step only on failure
+            bad = np.flatnonzero(np.diff(np.asarray(history, dtype=np.int64)) <= 0)
+            if bad.size:
+                j = int(bad[0]) + 1
+                self.fail(f"VM {i} clock decreased from {history[j-1]} to {history[j]}")
     
     def test_lamport_clock_property(self):
         """Test that Lamport's clock property holds: if event a happens before event b, then C(a) < C(b)"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
-        
-        # Reset all logical clocks to ensure a clean state
-        for vm in self.vms:
-            vm.logical_clock = 0
-        
         # Create a causal chain of events:
         # 1. VM0 internal event
         # 2. VM0 sends to VM1
@@ -155,7 +175,7 @@ class TestVirtualMachineRegression(unittest.TestCase):
         # 2. VM0 sends to VM1
         self.vms[0].send_message([0])  # First peer is VM1
         clock_values.append(("VM0 send", self.vms[0].logical_clock))
-        time.sleep(0.1)
+        self.wait_for_message(1)
         
         # 3. VM1 processes message
         self.vms[1].process_message()
@@ -168,65 +188,42 @@ class TestVirtualMachineRegression(unittest.TestCase):
         # 5. VM1 sends to VM2
         self.vms[1].send_message([1])  # Second peer is VM2
         clock_values.append(("VM1 send", self.vms[1].logical_clock))
-        time.sleep(0.1)
+        self.wait_for_message(2)
         
         # 6. VM2 processes message
         self.vms[2].process_message()
         clock_values.append(("VM2 receive", self.vms[2].logical_clock))
         
         # Check that clock values are strictly increasing along the causal chain
-        for i in range(1, len(clock_values)):
-            self.assertGreater(
-                clock_values[i][1], 
-                clock_values[i-1][1],
-                f"Clock did not increase from {clock_values[i-1][0]} ({clock_values[i-1][1]}) to {clock_values[i][0]} ({clock_values[i][1]})"
-            )
+        clocks = np.array([clock for _, clock in clock_values], dtype=np.int64)
+        bad = np.flatnonzero(np.diff(clocks) <= 0)
+        if bad.size:
+            i = int(bad[0]) + 1
+            self.fail(f"Clock did not increase from {clock_values[i-1][0]} ({clock_values[i-1][1]}) to {clock_values[i][0]} ({clock_values[i][1]})")
     
     def test_system_stability_under_load(self):
         """Test that the system remains stable under load"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
-        
         # Create worker threads to simulate load
         def worker(vm_idx):
             vm = self.vms[vm_idx]
-            for _ in range(20):
+            # Draw every decision up front: event kind, broadcast or not, target peer
+            decisions = np.random.default_rng(vm_idx).random((20, 3))
+            for i in range(20):
                 # Randomly choose between internal event and send message
-                if random.random() < 0.3:
+                if decisions[i, 0] < 0.3:
                     # Internal event
                     vm.process_internal_event()
                 else:
                     # Send message to random peer or all peers
-                    if random.random() < 0.7:
-                        target_idx = random.randint(0, 1)  # 0 or 1
+                    if decisions[i, 1] < 0.7:
+                        target_idx = int(decisions[i, 2] * 2)  # 0 or 1
                         vm.send_message([target_idx])
                     else:
                         vm.send_message()  # All peers
                 
                 # Process any received messages
-                while not vm.message_queue.empty():
+                while vm.message_queue:
                     vm.process_message()
-                
-                # Small delay
-                time.sleep(0.01)
-            time.sleep(1)
-            while not vm.message_queue.empty():
-                vm.process_message()
         
         # Start worker threads
         worker_threads = []
@@ -239,34 +236,22 @@ class TestVirtualMachineRegression(unittest.TestCase):
         for thread in worker_threads:
             thread.join()
         
+        # Drain whatever is still in flight; a quiet arrival flag means the
+        # socket has nothing more to deliver
+        for vm in self.vms:
+            while vm.message_arrived.wait(0.1):
+                vm.process_message()
+        
         # Check that all VMs are still in a valid state
         for i, vm in enumerate(self.vms):
             # Logical clock should be positive
             self.assertGreater(vm.logical_clock, 0, f"VM {i} has invalid logical clock: {vm.logical_clock}")
             
             # All message queues should eventually be processed
-            self.assertEqual(vm.message_queue.qsize(), 0, f"VM {i} still has {vm.message_queue.qsize()} unprocessed messages")
+            self.assertEqual(len(vm.message_queue), 0, f"VM {i} still has {len(vm.message_queue)} unprocessed messages")
     
     def test_connection_recovery(self):
         """Test that VMs can recover from connection failures"""
-        # Start server threads for each VM
-        server_threads = []
-        for vm in self.vms:
-            vm.running = True
-            thread = threading.Thread(target=vm.accept_connections, daemon=True)
-            thread.start()
-            server_threads.append(thread)
-        
-        # Give servers time to start
-        time.sleep(0.5)
-        
-        # Connect VMs to each other
-        for vm in self.vms:
-            vm.connect_to_peers()
-        
-        # Give connections time to establish
-        time.sleep(0.5)
-        
         # Verify initial connections
         for vm in self.vms:
             self.assertEqual(len(vm.peers), 2)
@@ -276,12 +261,11 @@ class TestVirtualMachineRegression(unittest.TestCase):
             peer.close()
         self.vms[1].peers = []
         
-        # Reconnect VM1 to its peers
+        # Reconnect VM1 to its peers; connecting is synchronous, and any
+        # refused attempt is retried after connect_retry_interval (10 ms
+        # here, set in setUpClass) rather than the default second
         self.vms[1].connect_to_peers()
         
-        # Give connections time to establish
-        time.sleep(0.5)
-        
         # Verify that VM1 has reconnected
         self.assertEqual(len(self.vms[1].peers), 2)
         
@@ -289,12 +273,13 @@ class TestVirtualMachineRegression(unittest.TestCase):
         # VM1 sends to all peers
         self.vms[1].send_message()
         
-        # Give time for messages to be received
-        time.sleep(0.5)
+        # Wait for the messages to be received
+        self.wait_for_message(0)
+        self.wait_for_message(2)
         
         # Check that VM0 and VM2 received the message
-        self.assertEqual(self.vms[0].message_queue.qsize(), 1)
-        self.assertEqual(self.vms[2].message_queue.qsize(), 1)
+        self.assertEqual(len(self.vms[0].message_queue), 1)
+        self.assertEqual(len(self.vms[2].message_queue), 1)
 
 
 if __name__ == '__main__':
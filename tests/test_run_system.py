@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import tempfile
+import socket
 from unittest.mock import patch, MagicMock, call, ANY
 
 # Add parent directory to path to import run_system
@@ -15,7 +16,8 @@ class TestRunSystem(unittest.TestCase):
         mock_process = MagicMock()
         mock_process.pid = 12345
         
-        with patch('subprocess.Popen', return_value=mock_process) as mock_popen:
+        with patch('subprocess.Popen', return_value=mock_process) as mock_popen, \
+             patch('run_system.wait_for_port', return_value=True) as mock_wait:
             # Mock time.sleep to avoid actual delays
             with patch('time.sleep'):
                 # Mock signal.signal to avoid actual signal handling
@@ -33,6 +35,12 @@ class TestRunSystem(unittest.TestCase):
             call(['python', 'logical_clock.py', '1', '8000', '2'])
         ])
         
+        # Check that each machine was waited on before starting the next
+        mock_wait.assert_has_calls([
+            call(8000, mock_process),
+            call(8001, mock_process)
+        ])
+        
         # Check that the process was terminated
         mock_process.terminate.assert_called()
     
@@ -42,7 +50,8 @@ class TestRunSystem(unittest.TestCase):
         mock_process = MagicMock()
         mock_process.pid = 12345
         
-        with patch('subprocess.Popen', return_value=mock_process) as mock_popen:
+        with patch('subprocess.Popen', return_value=mock_process) as mock_popen, \
+             patch('run_system.wait_for_port', return_value=True) as mock_wait:
             # Mock time.sleep to avoid actual delays
             with patch('time.sleep'):
                 # Mock signal.signal to avoid actual signal handling
@@ -69,9 +78,74 @@ class TestRunSystem(unittest.TestCase):
             call(['python', 'logical_clock.py', '1', '8000', '2'], env=ANY)
         ])
         
+        # Check that each machine was waited on before starting the next
+        mock_wait.assert_has_calls([
+            call(8000, mock_process),
+            call(8001, mock_process)
+        ])
+        
         # Check that the process was terminated
         mock_process.terminate.assert_called()
     
+    def test_run_system_with_launcher(self):
+        """Test that machines are started through the given launcher"""
+        mock_process = MagicMock()
+        mock_process.pid = 12345
+        mock_launcher = MagicMock(return_value=mock_process)
+        
+        with patch('subprocess.Popen') as mock_popen, \
+             patch('run_system.wait_for_port', return_value=True), \
+             patch('time.sleep'), \
+             patch('sys.stdout'):
+            run_system.run_system(num_machines=2, base_port=8000, duration=1, launcher=mock_launcher)
+        
+        mock_launcher.assert_has_calls([call(0, 8000, 2), call(1, 8000, 2)])
+        mock_popen.assert_not_called()
+        mock_process.terminate.assert_called()
+        mock_process.wait.assert_called()
+    
+    def test_fork_launcher(self):
+        """Test that the fork launcher starts logical_clock.main in a forked process"""
+        with patch('run_system.multiprocessing.get_context') as mock_get_context:
+            mock_process = mock_get_context.return_value.Process.return_value
+            mock_process.pid = 12345
+            mock_process.exitcode = None
+            
+            machine = run_system.fork_launcher(1, 8000, 3, env={'CLOCK_RATE_VARIATION': 'small'})
+        
+        mock_get_context.assert_called_once_with('fork')
+        mock_get_context.return_value.Process.assert_called_once_with(
+            target=run_system._run_forked_machine,
+            args=(1, 8000, 3, {'CLOCK_RATE_VARIATION': 'small'})
+        )
+        mock_process.start.assert_called_once()
+        
+        # The wrapper exposes the Popen methods run_system relies on
+        self.assertEqual(machine.pid, 12345)
+        self.assertIsNone(machine.poll())
+        machine.terminate()
+        mock_process.terminate.assert_called_once()
+        machine.wait()
+        mock_process.join.assert_called_once()
+    
+    def test_wait_for_port(self):
+        """Test waiting for a port that is already listening"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('localhost', 0))
+        server.listen(1)
+        try:
+            self.assertTrue(run_system.wait_for_port(server.getsockname()[1], timeout=1.0))
+        finally:
+            server.close()
+    
+    def test_wait_for_port_exited_process(self):
+        """Test that waiting stops when the machine process has exited"""
+        mock_process = MagicMock()
+        mock_process.poll.return_value = 1
+        with patch('run_system.socket.create_connection') as mock_connect:
+            self.assertFalse(run_system.wait_for_port(8000, mock_process))
+        mock_connect.assert_not_called()
+    
     def test_main_function(self):
         """Test the main function"""
         # Mock run_experiment